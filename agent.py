@@ -9,6 +9,10 @@ class BaseAgent(object):
     def test(self, env, nb_episodes):
         raise NotImplementedError
 
+    # Select an action for an observation, without learning from it
+    def act(self, observation):
+        raise NotImplementedError
+
     def save(self, out_dir):
         raise NotImplementedError
 
@@ -38,6 +42,9 @@ class Observer(BaseAgent):
         # Fitting and testing for the observer agent are the same.
         self.fit(env, nb_steps)
 
+    def act(self, observation):
+        return 0
+
     def save(self, out_dir):
         pass
 
@@ -0,0 +1,56 @@
+from argparse import ArgumentParser
+from os import environ
+from random import Random
+from timeit import default_timer
+
+# Missions run in the simulator backend, which has to be selected before malmopy is imported
+environ.setdefault('MALMO_SIMULATOR', '1')
+
+from missions.classroom import Classroom, ClassroomEnvironment, ClassroomStateBuilder
+
+
+def run_benchmark(ms_per_tick, repeat, episodes, seed):
+    mission = Classroom(ms_per_tick)
+    env = ClassroomEnvironment('discrete', mission.mission_name, mission.template, [('127.0.0.1', 10000)],
+                               ClassroomStateBuilder(32, 32, True), repeat=repeat)
+    rng = Random(seed)
+
+    steps = 0
+    step_ticks = []
+    started_at = default_timer()
+    for _ in range(episodes):
+        env.reset()
+        done = False
+        while not done:
+            _, _, done, _ = env.step(rng.randrange(env.available_actions))
+            steps += 1
+            # The last step of an episode stops at the end of the mission
+            if not done:
+                step_ticks.append(env.step_ticks)
+    elapsed = default_timer() - started_at
+    env.close()
+
+    mean_ticks = sum(step_ticks) / float(max(1, len(step_ticks)))
+    print('MsPerTick {:3d}, repeat {}: {:7.1f} steps/s, {:5.2f} ticks per step over {} steps'.format(
+        ms_per_tick, repeat, steps / elapsed, mean_ticks, steps))
+
+    # Each action is held for repeat ticks, a late poll may let one more tick through
+    assert len(step_ticks) > 0, 'episodes ended on their first step'
+    assert repeat <= mean_ticks <= repeat + 1, 'steps should last about %d ticks, got %.2f' % (repeat, mean_ticks)
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser('Environment benchmark on the simulator backend')
+    arg_parser.add_argument('--ms-per-tick', type=int, nargs='+', default=[50, 10],
+                            help='Tick durations to run the mission at')
+    arg_parser.add_argument('--repeat', type=int, nargs='+', default=[1, 4],
+                            help='Numbers of ticks each action is held for')
+    arg_parser.add_argument('--episodes', type=int, default=2,
+                            help='Number of episodes run for each setting')
+    arg_parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random actions')
+    args = arg_parser.parse_args()
+
+    for ms_per_tick in args.ms_per_tick:
+        for repeat in args.repeat:
+            run_benchmark(ms_per_tick, repeat, args.episodes, args.seed)
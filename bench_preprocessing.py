@@ -0,0 +1,62 @@
+from argparse import ArgumentParser
+from timeit import default_timer
+
+import numpy as np
+from PIL import Image
+
+from malmopy.util import FramePreprocessor
+
+
+# The PIL pipeline previously used by the state builders
+def pil_preprocess(frame, width, height, grayscale):
+    img = Image.fromarray(frame[:, :, :3]).resize((width, height))
+    if grayscale:
+        img = img.convert('L')
+    return np.array(img)
+
+
+def time_per_frame(function, frames, iterations):
+    started_at = default_timer()
+    for i in range(iterations):
+        function(frames[i % len(frames)])
+    return (default_timer() - started_at) / iterations
+
+
+def run_benchmark(frame_size, state_size, channels, grayscale, iterations):
+    # Frames drawn at random, not to favor any caching. Noise exaggerates the difference between area pooling
+    # and the bicubic filter of PIL
+    rng = np.random.RandomState(0)
+    frames = [rng.randint(0, 256, (frame_size[1], frame_size[0], channels)).astype(np.uint8) for _ in range(8)]
+
+    preprocessor = FramePreprocessor(state_size[0], state_size[1], grayscale)
+    out = np.empty(preprocessor.shape, dtype=np.uint8)
+
+    pil = time_per_frame(lambda frame: pil_preprocess(frame, state_size[0], state_size[1], grayscale),
+                         frames, iterations)
+    kernel = time_per_frame(preprocessor.process, frames, iterations)
+    kernel_out = time_per_frame(lambda frame: preprocessor.process(frame, out), frames, iterations)
+
+    difference = np.abs(preprocessor.process(frames[0]).astype(np.int16) -
+                        pil_preprocess(frames[0], state_size[0], state_size[1], grayscale)).mean()
+
+    print('{:>9} -> {:>7} {:>4} x{}: PIL {:8.1f}us, kernel {:8.1f}us ({:4.1f}x), into buffer {:8.1f}us, '
+          'mean difference {:.2f}'.format('%dx%d' % frame_size, '%dx%d' % state_size,
+                                          'gray' if grayscale else 'rgb', channels, pil * 1e6, kernel * 1e6,
+                                          pil / kernel, kernel_out * 1e6, difference))
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser('Frame preprocessing benchmark')
+    arg_parser.add_argument('--iterations', type=int, default=1000,
+                            help='Number of frames processed by each pipeline')
+    args = arg_parser.parse_args()
+
+    # Original mission resolution, resolutions negotiated with the state builders (2x oversampling),
+    # and a non integer ratio handled by the OpenCV / Pillow fallback
+    for frame_size, state_size, channels in (((512, 512), (32, 32), 3),
+                                             ((64, 64), (32, 32), 3),
+                                             ((64, 64), (32, 32), 4),
+                                             ((168, 168), (84, 84), 3),
+                                             ((320, 240), (84, 84), 3)):
+        for grayscale in (True, False):
+            run_benchmark(frame_size, state_size, channels, grayscale, args.iterations)
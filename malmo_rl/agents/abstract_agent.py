@@ -5,6 +5,22 @@ from malmo_rl.agents.qlearner import QLearner
 from malmo_rl.agents.ddpglearner import DDPGLearner
 
 
+# keras-rl's fit() runs its periodic test episodes (test_interval) through the agent's test() method.
+# Wrapping the method of the keras-rl agent flags them as evaluation episodes, as those of AbstractAgent.test()
+def _flag_evaluation(keras_agent):
+    test = keras_agent.test
+
+    def evaluating_test(env, *args, **kwargs):
+        evaluating = env.evaluating
+        env.evaluating = True
+        try:
+            return test(env, *args, **kwargs)
+        finally:
+            env.evaluating = evaluating
+
+    keras_agent.test = evaluating_test
+
+
 class AbstractAgent(BaseAgent):
     def __init__(self, name, env, agent_type, **kwargs):
         if agent_type == 'random':
@@ -19,11 +35,22 @@ class AbstractAgent(BaseAgent):
             RuntimeError('Unknown agent type')
         super(AbstractAgent, self).__init__(name, env)
 
+        if hasattr(getattr(self.agent, 'agent', None), 'test'):
+            _flag_evaluation(self.agent.agent)
+
     def fit(self, env, nb_steps):
         self.agent.fit(env, nb_steps)
 
+    # Episodes are flagged as evaluation episodes, e.g. for the environment's recording policy
     def test(self, env, nb_episodes):
-        return self.agent.test(env, nb_episodes)
+        env.evaluating = True
+        try:
+            return self.agent.test(env, nb_episodes)
+        finally:
+            env.evaluating = False
+
+    def act(self, observation):
+        return self.agent.act(observation)
 
     def save(self, out_dir):
         self.agent.save(out_dir)
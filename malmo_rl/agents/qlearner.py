@@ -34,6 +34,9 @@ class QLearner(BaseAgent):
         self.recurrent = False  # Use LSTM
         self.batch_size = 32
         self.window_length = 4
+        # Each action is held for 4 ticks, natively by the environment if it repeats actions itself
+        assert 4 % env.repeat == 0, 'the environment should repeat actions for 1, 2 or 4 ticks'
+        self.action_repetition = 4 // env.repeat
 
         if tf:
             config = tf.ConfigProto()
@@ -73,11 +76,15 @@ class QLearner(BaseAgent):
             os.makedirs(weights_dir)
         weights_path = os.path.join(weights_dir, '{}'.format(self.name))
         callbacks = [ModelIntervalCheckpoint(weights_path, interval=10000, verbose=1)]
-        self.agent.fit(env, nb_steps, action_repetition=4, callbacks=callbacks, verbose=1, log_interval=10000,
-                       test_interval=10000, test_nb_episodes=10, test_action_repetition=4, test_visualize=False)
+        self.agent.fit(env, nb_steps, action_repetition=self.action_repetition, callbacks=callbacks, verbose=1,
+                       log_interval=10000, test_interval=10000, test_nb_episodes=10,
+                       test_action_repetition=self.action_repetition, test_visualize=False)
 
     def test(self, env, nb_episodes):
-        self.agent.test(env, nb_episodes, action_repetition=4, verbose=1, visualize=False)
+        self.agent.test(env, nb_episodes, action_repetition=self.action_repetition, verbose=1, visualize=False)
+
+    def act(self, observation):
+        return self.agent.forward(self.processor.process_observation(observation))
 
     def save(self, out_dir):
         self.agent.save_weights(out_dir, overwrite=True)
@@ -8,11 +8,17 @@ class Random(BaseAgent):
 
         self.nb_actions = env.available_actions
         self.agent = RandomAgent(nb_actions=self.nb_actions)
+        # Each action is held for 4 ticks, natively by the environment if it repeats actions itself
+        assert 4 % env.repeat == 0, 'the environment should repeat actions for 1, 2 or 4 ticks'
+        self.action_repetition = 4 // env.repeat
 
     def fit(self, env, nb_steps):
         # Crashes for verbose=1
-        self.agent.fit(env, nb_steps, action_repetition=4)
+        self.agent.fit(env, nb_steps, action_repetition=self.action_repetition)
 
     # Fitting and testing for the random agent are the same.
     def test(self, env, nb_steps):
         self.fit(env, nb_steps)
+
+    def act(self, observation):
+        return self.agent.forward(observation)
@@ -17,5 +17,26 @@
 
 from __future__ import absolute_import
 
-from .malmo import MalmoEnvironment, allocate_remotes
+import sys
+
+from .malmo import MalmoEnvironment, WorldStateSnapshot, allocate_remotes, frame_to_array, frame_type
 from .malmo import MalmoStateBuilder, MalmoRGBStateBuilder, MalmoALEStateBuilder
+from .calibration import TickCalibrator
+from .clients import ClientRegistry, start_client_manager, connect_client_manager
+from .commands import CommandChannel
+from .coordination import MissionStartBarrier
+from .entities import ENTITY_DTYPE, EntityDecoder, pairwise_distances, distances_to, k_nearest, within_radius
+from .grid import GridDecoder
+from .latency import LatencyHistogram, LatencyTracker, timestamp_seconds
+from .observations import ObservationSchema, ObservationParser
+from .recording import RecordingPolicy
+from .template import MissionTemplate
+from .subproc import MalmoSubprocVecEnvironment
+from .vec import MalmoVecEnvironment
+from .wait import WaitStrategy, SpinWaitStrategy, BackoffWaitStrategy, WaitTimeoutError, MissionStalledError
+from .wait import sleep_through, sleep_through_all
+from .vocabulary import Vocabulary
+
+# async/await syntax is only available from Python 3.5
+if sys.version_info >= (3, 5):
+    from .aio import AsyncMalmoEnvironment
@@ -0,0 +1,80 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import asyncio
+
+
+async def _run(delays):
+    for delay in delays:
+        # Sleeping 0 still hands control back to the event loop, so other environments make progress
+        await asyncio.sleep(delay)
+
+
+class AsyncMalmoEnvironment(object):
+    """
+    Drive a MalmoEnvironment from an asyncio event loop.
+
+    Waiting for Minecraft ticks is done with asyncio.sleep(), so a single event loop can drive
+    many environments (one per AgentHost) and interleave them with model inference:
+
+        envs = [AsyncMalmoEnvironment(env) for env in environments]
+        states = await asyncio.gather(*[env.reset() for env in envs])
+        transitions = await asyncio.gather(*[env.step(a) for env, a in zip(envs, actions)])
+
+    Calls into the native Malmo layer (e.g. startMission) still run on the event loop thread.
+    All the other attributes are forwarded to the wrapped environment.
+    """
+
+    def __init__(self, environment):
+        assert hasattr(environment, 'iter_reset') and hasattr(environment, 'iter_do'), \
+            'environment should inherit from MalmoEnvironment'
+        self._env = environment
+
+    @property
+    def environment(self):
+        return self._env
+
+    async def reset(self):
+        """
+        Start a new mission
+        :return: The first state
+        """
+        await _run(self._env.iter_reset())
+        return self._env.state
+
+    async def do(self, action_id):
+        """
+        Do an action, see MalmoEnvironment.do()
+        :return: Tuple (state, reward, done)
+        """
+        await _run(self._env.iter_do(action_id))
+        return self._env.state, self._env.reward, self._env.done
+
+    async def step(self, action):
+        """
+        Do an action, see MissionEnvironment.step()
+        :return: Tuple (state, reward, done, info)
+        """
+        assert hasattr(self._env, 'iter_step'), 'step() requires a MissionEnvironment'
+
+        await _run(self._env.iter_step(action))
+        return self._env.state, self._env.reward, self._env.done, {}
+
+    def __getattr__(self, name):
+        return getattr(self._env, name)
@@ -0,0 +1,36 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+"""
+Select the implementation of the Malmo API.
+
+MalmoPython is used unless the MALMO_SIMULATOR environment variable is set (to anything but 0),
+in which case missions run in the simulator module, without Minecraft.
+"""
+
+from __future__ import absolute_import
+
+import os
+
+SIMULATOR_ENABLED = os.environ.get('MALMO_SIMULATOR', '0') not in ('', '0')
+
+if SIMULATOR_ENABLED:
+    from .simulator import AgentHost, ClientInfo, ClientPool, MissionRecordSpec, MissionSpec
+
+    print('MALMO_SIMULATOR set, using the simulator backend.')
+else:
+    from MalmoPython import AgentHost, ClientInfo, ClientPool, MissionRecordSpec, MissionSpec
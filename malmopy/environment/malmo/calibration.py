@@ -0,0 +1,126 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+from time import time
+
+
+class TickCalibrator(object):
+    """
+    Find the fastest MsPerTick at which the agent keeps up with Minecraft.
+
+    A short probe episode is run for each candidate tick duration, from the slowest to the fastest.
+    Only its first probe_steps steps are measured, the rest of the episode is played out with the last action.
+    Steps observing more ticks than the environment's repeat mean that ticks went by while the agent
+    was busy: their observations were never acted upon. The fastest candidate whose ratio of missed ticks
+    stays under max_missed_ratio is set on the environment, which retunes its waits to the new tick duration.
+    """
+
+    def __init__(self, environment, policy, candidates=(50, 40, 30, 20, 15, 10, 5), probe_steps=200,
+                 max_missed_ratio=.05, action_repetition=1):
+        """
+        :param environment: MalmoEnvironment (or MissionEnvironment) to probe
+        :param policy: Callable(state) returning an action, timed as the agent's step time
+        :param candidates: MsPerTick values to try
+        :param probe_steps: Number of environment steps per candidate, episodes are restarted if needed
+        :param max_missed_ratio: Maximum ratio of missed ticks over elapsed ticks to consider the agent in sync
+        :param action_repetition: Number of environment steps per policy call, as for the agent's training
+        """
+        assert policy is not None and callable(policy), 'policy should be callable'
+        assert candidates is not None and len(candidates) > 0, 'at least 1 candidate should be provided'
+        assert probe_steps > 0, 'probe_steps should be > 0'
+        assert 0 <= max_missed_ratio < 1, 'max_missed_ratio should be in [0, 1['
+        assert action_repetition >= 1, 'action_repetition should be >= 1'
+
+        self._env = environment
+        self._policy = policy
+        self._candidates = sorted(set(int(ms) for ms in candidates), reverse=True)
+        self._probe_steps = int(probe_steps)
+        self._max_missed_ratio = max_missed_ratio
+        self._action_repetition = int(action_repetition)
+        self._results = []
+
+    @property
+    def results(self):
+        """
+        List of dictionaries describing each probe
+        """
+        return list(self._results)
+
+    def _step(self, action):
+        if hasattr(self._env, 'step'):
+            return self._env.step(action)[0]
+        return self._env.do(action)[0]
+
+    def probe(self, ms_per_tick):
+        """
+        Run a probe episode at the given tick duration
+        :return: Dictionary with the number of steps, elapsed and missed ticks, and mean agent and step times
+        """
+        self._env.ms_per_tick = ms_per_tick
+        expected = getattr(self._env, 'repeat', 1)
+
+        state = self._env.reset()
+        action = None
+        ticks = missed = 0
+        agent_time = step_time = 0.
+        for step in range(self._probe_steps):
+            if self._env.done:
+                state = self._env.reset()
+
+            if step % self._action_repetition == 0:
+                started_at = time()
+                action = self._policy(state)
+                agent_time += time() - started_at
+
+            started_at = time()
+            state = self._step(action)
+            step_time += time() - started_at
+
+            ticks += self._env.step_ticks
+            missed += max(0, self._env.step_ticks - expected)
+
+        # The next mission can only start once this one is over, play it out with the last action
+        while not self._env.done:
+            self._step(action)
+
+        policy_calls = (self._probe_steps + self._action_repetition - 1) // self._action_repetition
+        return {'ms_per_tick': ms_per_tick, 'steps': self._probe_steps, 'ticks': ticks, 'missed_ticks': missed,
+                'missed_ratio': missed / float(ticks) if ticks > 0 else 0.,
+                'agent_ms': 1000. * agent_time / policy_calls, 'step_ms': 1000. * step_time / self._probe_steps}
+
+    def calibrate(self):
+        """
+        Probe the candidates and set the fastest tick duration keeping the agent in sync on the environment.
+        If the agent does not keep up with any candidate, the slowest one is used.
+        :return: Selected MsPerTick
+        """
+        self._results = []
+        selected = self._candidates[0]
+        for ms_per_tick in self._candidates:
+            result = self.probe(ms_per_tick)
+            result['in_sync'] = result['missed_ratio'] <= self._max_missed_ratio
+            self._results.append(result)
+
+            # Faster ticks would only miss more
+            if not result['in_sync']:
+                break
+            selected = ms_per_tick
+
+        self._env.ms_per_tick = selected
+        return selected
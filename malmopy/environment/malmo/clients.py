@@ -0,0 +1,238 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import socket
+from multiprocessing.managers import BaseManager
+from threading import Lock
+from time import time
+
+import six
+
+from .backend import SIMULATOR_ENABLED
+
+
+class ClientStatus(object):
+    """
+    What is known about a Minecraft client
+    """
+
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = int(port)
+        self.leases = 0
+        self.missions = 0
+        self.failures = 0
+        self.latency = None
+        self.healthy = True
+        self.last_probe = None
+        self.last_failure = None
+
+    @property
+    def address(self):
+        return self.ip, self.port
+
+    def as_dict(self):
+        return {'ip': self.ip, 'port': self.port, 'leases': self.leases, 'missions': self.missions,
+                'failures': self.failures, 'latency': self.latency, 'healthy': self.healthy}
+
+
+class ClientRegistry(object):
+    """
+    Shared view of a set of Minecraft clients, handing out leases to environments.
+
+    Clients are probed before being leased, and a client is only leased to one environment at a time.
+    Among the free healthy clients, the one with the fewest failures is selected, ties being broken by
+    mission start latency. Clients failing max_failures times in a row are not leased anymore, until
+    they pass a probe once cooldown seconds went by since their last failure.
+    Only a successful mission resets the failure count.
+
+    Use start_client_manager() / connect_client_manager() to share one registry between processes.
+    """
+
+    LATENCY_SMOOTHING = .2
+
+    def __init__(self, remotes, probe_timeout=1., max_failures=3, cooldown=30.):
+        """
+        :param remotes: Sequence of (ip, port) tuples, or of 'ip:port' strings
+        :param probe_timeout: Number of seconds to wait when probing a client
+        :param max_failures: Number of consecutive failures after which a client is considered unhealthy
+        :param cooldown: Number of seconds after which an unhealthy client is probed again
+        """
+        assert remotes is not None and len(remotes) > 0, 'at least 1 client should be provided'
+        assert max_failures > 0, 'max_failures should be > 0'
+        assert cooldown >= 0, 'cooldown should be >= 0'
+
+        self._clients = []
+        for remote in remotes:
+            if isinstance(remote, six.string_types):
+                remote = remote.split(':')
+            self._clients.append(ClientStatus(remote[0], remote[1] if len(remote) > 1 else 10000))
+
+        self._probe_timeout = probe_timeout
+        self._max_failures = max_failures
+        self._cooldown = cooldown
+        self._lock = Lock()
+
+    def _find(self, address):
+        ip, port = address[0], int(address[1])
+        for client in self._clients:
+            if client.ip == ip and client.port == port:
+                return client
+        raise ValueError('Unknown client %s:%d' % (ip, port))
+
+    def _probe(self, client):
+        try:
+            # Simulated clients live in the agent host, there is nothing to connect to
+            if not SIMULATOR_ENABLED:
+                connection = socket.create_connection(client.address, self._probe_timeout)
+                connection.close()
+            client.healthy = True
+        except (socket.error, socket.timeout):
+            client.healthy = False
+        client.last_probe = time()
+        return client.healthy
+
+    def probe(self):
+        """
+        Check which clients accept connections
+        :return: List of the (ip, port) of the healthy clients
+        """
+        with self._lock:
+            return [client.address for client in self._clients if self._probe(client)]
+
+    def _cooled_down(self, client, now):
+        return client.failures < self._max_failures or client.last_failure is None \
+               or now - client.last_failure >= self._cooldown
+
+    def acquire(self, exclude=None, fallback=False):
+        """
+        Lease a free healthy client
+        :param exclude: Optional sequence of (ip, port) not to lease
+        :param fallback: When no healthy client is available, lease an unhealthy client passing a probe
+        without waiting for its cooldown, the most recently failed last
+        :return: (ip, port) of the leased client, or None if all the clients are leased or unhealthy
+        """
+        exclude = [(ip, int(port)) for ip, port in exclude] if exclude is not None else []
+
+        with self._lock:
+            now = time()
+            free = [client for client in self._clients if client.leases == 0 and client.address not in exclude]
+            candidates = [client for client in free if self._cooled_down(client, now)]
+            candidates.sort(key=lambda client: (client.failures, client.latency if client.latency is not None else 0.))
+
+            if fallback:
+                cooling_down = [client for client in free if not self._cooled_down(client, now)]
+                candidates.extend(sorted(cooling_down, key=lambda client: client.last_failure))
+
+            for client in candidates:
+                if self._probe(client):
+                    client.leases += 1
+                    return client.address
+        return None
+
+    def release(self, address):
+        """
+        Give a leased client back
+        """
+        with self._lock:
+            client = self._find(address)
+            client.leases = max(0, client.leases - 1)
+
+    def report_success(self, address, latency):
+        """
+        Record a mission successfully started on a client
+        :param latency: Number of seconds between the mission start request and the first observation
+        """
+        with self._lock:
+            client = self._find(address)
+            client.missions += 1
+            client.failures = 0
+            client.healthy = True
+            if client.latency is None:
+                client.latency = latency
+            else:
+                client.latency += ClientRegistry.LATENCY_SMOOTHING * (latency - client.latency)
+
+    def report_failure(self, address, stalled=False):
+        """
+        Record a mission which could not be started or stalled on a client.
+        A start failure is not counted if the client still accepts connections: it is then busy
+        (e.g. with an experiment not sharing this registry) or warming up, rather than unhealthy.
+        :param stalled: The client hung during a mission. A hung client may still accept connections,
+        so it is considered unhealthy right away, and is only probed again after the cooldown.
+        """
+        with self._lock:
+            client = self._find(address)
+            if not stalled and self._probe(client):
+                return
+            client.failures = max(client.failures + 1, self._max_failures if stalled else 0)
+            client.last_failure = time()
+            if client.failures >= self._max_failures:
+                client.healthy = False
+
+    def status(self):
+        """
+        :return: List of dictionaries describing each client
+        """
+        with self._lock:
+            return [client.as_dict() for client in self._clients]
+
+
+class ClientManager(BaseManager):
+    pass
+
+
+_registry = None
+
+
+def _create_registry(remotes, probe_timeout, max_failures, cooldown):
+    global _registry
+    _registry = ClientRegistry(remotes, probe_timeout, max_failures, cooldown)
+
+
+def _get_registry():
+    return _registry
+
+
+ClientManager.register('get_registry', callable=_get_registry)
+
+
+def start_client_manager(remotes, address=('127.0.0.1', 0), authkey=None, probe_timeout=1., max_failures=3,
+                         cooldown=30.):
+    """
+    Start a manager process owning a ClientRegistry.
+    Other experiments can share it through connect_client_manager(manager.address, authkey).
+    :param remotes: Sequence of (ip, port) tuples, or of 'ip:port' strings
+    :param address: Address the manager listens on, port 0 picks a free port
+    :param authkey: Bytes required to connect to the manager (defaults to the current process' authkey)
+    :return: Tuple (manager, registry proxy)
+    """
+    manager = ClientManager(address=address, authkey=authkey)
+    manager.start(_create_registry, (remotes, probe_timeout, max_failures, cooldown))
+    return manager, manager.get_registry()
+
+
+def connect_client_manager(address, authkey):
+    """
+    Connect to a manager started by start_client_manager()
+    :return: Registry proxy
+    """
+    manager = ClientManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+    return manager.get_registry()
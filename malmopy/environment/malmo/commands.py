@@ -0,0 +1,158 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+from math import floor, log10
+
+import six
+
+# Commands of the ContinuousMovementCommands handler hold their value until changed, resending them is a no-op
+STATEFUL_VERBS = ('move', 'strafe', 'turn', 'pitch', 'jump', 'crouch', 'attack', 'use')
+
+
+class CommandChannel(object):
+    """
+    Buffer the Malmo commands of a step and send them in one flush.
+
+    Continuous values are quantized, and their command strings are cached per quantized value instead of being
+    formatted at each step. When deduplicating, only the last command per stateful verb (see STATEFUL_VERBS) is
+    kept within a flush, and commands setting a stateful verb to the value it already holds are dropped.
+
+    Dropped commands are not rewarded by the mission's RewardForSendingCommand: with deduplication, holding
+    an action costs nothing and only changing it does, which changes the problem an agent learns.
+    """
+
+    def __init__(self, quantum=.01, deduplicate=False):
+        """
+        :param quantum: Step of the continuous values sent, e.g. .01 sends 'move 0.37' for 0.3712
+        :param deduplicate: Drop the commands repeating the active state. Turn-based missions need each command
+        to be sent, with the turn key
+        """
+        assert quantum > 0, 'quantum should be > 0'
+
+        self._quantum = quantum
+        self._decimals = max(0, -int(floor(log10(quantum))))
+        self._deduplicate = bool(deduplicate)
+
+        self._verbs = {}
+        self._values = {}
+        self._pending = []
+        self._active = {}
+        self._sent = 0
+        self._dropped = 0
+
+    @property
+    def quantum(self):
+        return self._quantum
+
+    @property
+    def sent(self):
+        """
+        Number of commands sent to the agent host
+        """
+        return self._sent
+
+    @property
+    def dropped(self):
+        """
+        Number of commands dropped because they were overridden or did not change the active state
+        """
+        return self._dropped
+
+    @property
+    def active(self):
+        """
+        Dictionary mapping each stateful verb to the last command sent for it
+        """
+        return dict(self._active)
+
+    def compile(self, commands):
+        """
+        Precompute the dispatch table of the commands sent verbatim, such as discrete actions
+        :param commands: Iterable of command strings
+        """
+        for command in commands:
+            self._verb(command)
+
+    def _verb(self, command):
+        verb = self._verbs.get(command, None)
+        if verb is None:
+            verb = self._verbs[command] = command.split(' ', 1)[0]
+        return verb
+
+    def quantize(self, value):
+        return int(round(float(value) / self._quantum))
+
+    def send(self, command):
+        """
+        Queue a command until the next #flush()
+        """
+        assert isinstance(command, six.string_types)
+
+        verb = self._verb(command)
+        for i, (pending_verb, _) in enumerate(self._pending):
+            # The last command of a flush wins
+            if self._deduplicate and pending_verb == verb and verb in STATEFUL_VERBS:
+                del self._pending[i]
+                self._dropped += 1
+                break
+        self._pending.append((verb, command))
+
+    def set(self, verb, value):
+        """
+        Queue a continuous command, e.g. set('move', .37)
+        """
+        key = (verb, self.quantize(value))
+        command = self._values.get(key, None)
+        if command is None:
+            command = self._values[key] = '%s %.*f' % (verb, self._decimals, key[1] * self._quantum)
+            self._verbs[command] = verb
+        self.send(command)
+
+    def flush(self, agent_host, turn_key=None):
+        """
+        Send the queued commands
+        :param agent_host: Malmo AgentHost
+        :param turn_key: Key of the current turn, for turn-based missions
+        :return: Number of commands sent
+        """
+        sent = 0
+        for verb, command in self._pending:
+            stateful = verb in STATEFUL_VERBS
+            if self._deduplicate and stateful and self._active.get(verb, None) == command:
+                self._dropped += 1
+                continue
+
+            if turn_key is None:
+                agent_host.sendCommand(command)
+            else:
+                agent_host.sendCommand(command, turn_key)
+            if stateful:
+                self._active[verb] = command
+            sent += 1
+
+        self._pending = []
+        self._sent += sent
+        return sent
+
+    def reset(self):
+        """
+        Forget the active state, e.g. when a new mission starts. Queued commands are dropped.
+        """
+        self._pending = []
+        self._active.clear()
@@ -0,0 +1,57 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+from multiprocessing import Value
+
+
+class MissionStartBarrier(object):
+    """
+    Coordinate the mission starts of the role processes of a multi-agent mission.
+
+    Role 0 hosts the mission's server, the other roles can only join once it is up. Role 0 announces
+    each mission it got accepted by its client, the other roles wait for this announcement before
+    calling startMission instead of retrying blindly.
+
+    The barrier relies on shared memory: create it in the parent process and hand it to each role process.
+    """
+
+    def __init__(self):
+        self._announced = Value('i', 0)
+
+    @property
+    def announced(self):
+        """
+        Number of missions started by role 0 so far
+        """
+        return self._announced.value
+
+    def announce(self, mission_index):
+        """
+        Called by role 0 once its mission_index-th mission start was accepted
+        :param mission_index: 1-based index of the mission
+        """
+        with self._announced.get_lock():
+            self._announced.value = max(self._announced.value, mission_index)
+
+    def is_announced(self, mission_index):
+        """
+        Check whether other roles can join the mission_index-th mission
+        :param mission_index: 1-based index of the mission
+        """
+        return self._announced.value >= mission_index
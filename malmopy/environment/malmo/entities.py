@@ -0,0 +1,161 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import numpy as np
+
+from .vocabulary import Vocabulary
+
+ENTITY_DTYPE = np.dtype([('name', np.int16), ('x', np.float32), ('y', np.float32), ('z', np.float32),
+                         ('yaw', np.float32), ('life', np.float32)])
+
+
+class EntityDecoder(object):
+    """
+    Decode an ObservationFromNearbyEntities list into a structured numpy array (see ENTITY_DTYPE).
+
+    Entity names are mapped to ids through a Vocabulary, entities without life (items) get a life of 0.
+    The returned array is a view over a preallocated buffer which is reused between calls:
+    copy it if it needs to outlive the next #decode().
+    """
+
+    def __init__(self, name, vocabulary=None, capacity=64):
+        """
+        :param name: Name of the entity list, as declared in the mission's ObservationFromNearbyEntities
+        :param vocabulary: Vocabulary shared between decoders, a new one is created if None
+        :param capacity: Initial number of entities the buffer can hold, it grows when needed
+        """
+        assert capacity > 0, 'capacity should be > 0'
+
+        self._name = name
+        self._vocabulary = vocabulary if vocabulary is not None else Vocabulary(max_size=1024)
+        self._buffer = np.zeros(capacity, dtype=ENTITY_DTYPE)
+        self._entities = self._buffer[:0]
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def vocabulary(self):
+        return self._vocabulary
+
+    @property
+    def entities(self):
+        """
+        Last decoded entities
+        """
+        return self._entities
+
+    def decode(self, world_observations):
+        """
+        Decode the entities from the latest observations
+        :param world_observations: Dictionary of decoded observations (see MalmoEnvironment.world_observations)
+        :return: Structured array of ENTITY_DTYPE, or None if the observations do not hold the entity list
+        """
+        if world_observations is None:
+            return None
+
+        entities = world_observations.get(self._name, None)
+        if entities is None:
+            return None
+
+        count = len(entities)
+        if count > len(self._buffer):
+            self._buffer = np.zeros(max(count, 2 * len(self._buffer)), dtype=ENTITY_DTYPE)
+
+        vocabulary = self._vocabulary
+        self._buffer[:count] = [(vocabulary.id(entity.get(u'name', Vocabulary.UNKNOWN)),
+                                 entity.get(u'x', 0.), entity.get(u'y', 0.), entity.get(u'z', 0.),
+                                 entity.get(u'yaw', 0.), entity.get(u'life', 0.)) for entity in entities]
+        self._entities = self._buffer[:count]
+        return self._entities
+
+
+def positions(entities, planar=False):
+    """
+    Stack entity coordinates
+    :param entities: Structured array of ENTITY_DTYPE
+    :param planar: Only keep the horizontal (x, z) coordinates
+    :return: Float array of shape (n, 2) if planar else (n, 3)
+    """
+    if planar:
+        return np.column_stack((entities['x'], entities['z']))
+    return np.column_stack((entities['x'], entities['y'], entities['z']))
+
+
+def pairwise_distances(entities, planar=False):
+    """
+    Euclidean distances between all the pairs of entities
+    :param entities: Structured array of ENTITY_DTYPE
+    :param planar: Ignore the vertical axis
+    :return: Float array of shape (n, n)
+    """
+    coords = positions(entities, planar)
+    deltas = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+    return np.sqrt(np.einsum('ijk,ijk->ij', deltas, deltas))
+
+
+def distances_to(entities, origin, planar=False):
+    """
+    Euclidean distances between each entity and the origin
+    :param entities: Structured array of ENTITY_DTYPE
+    :param origin: (x, y, z) coordinates, or (x, z) if planar
+    :param planar: Ignore the vertical axis
+    :return: Float array of shape (n,)
+    """
+    deltas = positions(entities, planar) - np.asarray(origin, dtype=np.float32)
+    return np.sqrt(np.einsum('ij,ij->i', deltas, deltas))
+
+
+def k_nearest(entities, origin, k, name_id=None, planar=False):
+    """
+    Indices of the k entities closest to the origin, nearest first
+    :param entities: Structured array of ENTITY_DTYPE
+    :param origin: (x, y, z) coordinates, or (x, z) if planar
+    :param k: Maximum number of entities to return
+    :param name_id: Only consider entities with this name id (see Vocabulary.id())
+    :param planar: Ignore the vertical axis
+    :return: Integer array of at most k indices into entities
+    """
+    candidates = np.arange(len(entities)) if name_id is None else np.flatnonzero(entities['name'] == name_id)
+    if len(candidates) == 0 or k <= 0:
+        return candidates[:0]
+
+    distances = distances_to(entities[candidates], origin, planar)
+    if k < len(candidates):
+        nearest = np.argpartition(distances, k - 1)[:k]
+    else:
+        nearest = np.arange(len(candidates))
+    return candidates[nearest[np.argsort(distances[nearest])]]
+
+
+def within_radius(entities, origin, radius, name_id=None, planar=False):
+    """
+    Indices of the entities closer to the origin than the radius
+    :param entities: Structured array of ENTITY_DTYPE
+    :param origin: (x, y, z) coordinates, or (x, z) if planar
+    :param radius: Maximum distance to the origin
+    :param name_id: Only consider entities with this name id (see Vocabulary.id())
+    :param planar: Ignore the vertical axis
+    :return: Integer array of indices into entities
+    """
+    mask = distances_to(entities, origin, planar) <= radius
+    if name_id is not None:
+        mask &= entities['name'] == name_id
+    return np.flatnonzero(mask)
@@ -0,0 +1,118 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import numpy as np
+
+from .vocabulary import Vocabulary
+
+
+class GridDecoder(object):
+    """
+    Decode an ObservationFromGrid list of block names into a categorical numpy array.
+
+    Malmo lists the blocks of a grid with x varying fastest, then z, then y, so the decoded array
+    has shape (y, z, x). The array and the optional one-hot encoding are preallocated and
+    reused between calls: copy them if they need to outlive the next #decode().
+    """
+
+    def __init__(self, name, shape, vocabulary=None):
+        """
+        :param name: Name of the grid, as declared in the mission's ObservationFromGrid
+        :param shape: Grid shape as (y, z, x)
+        :param vocabulary: Vocabulary shared between decoders, a new one is created if None
+        """
+        assert len(shape) == 3, 'shape should be (y, z, x)'
+        assert all(size > 0 for size in shape), 'shape dimensions should be > 0'
+
+        self._name = name
+        self._shape = tuple(int(size) for size in shape)
+        self._vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+
+        self._grid = np.zeros(self._shape, dtype=self._vocabulary.dtype)
+        self._one_hot = None
+        self._last_names = None
+
+    @classmethod
+    def from_range(cls, name, min_corner, max_corner, vocabulary=None):
+        """
+        Build a decoder from the grid bounds declared in the mission XML
+        :param min_corner: (x, y, z) of the <min> element
+        :param max_corner: (x, y, z) of the <max> element
+        """
+        (x1, y1, z1), (x2, y2, z2) = min_corner, max_corner
+        return cls(name, (y2 - y1 + 1, z2 - z1 + 1, x2 - x1 + 1), vocabulary)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def vocabulary(self):
+        return self._vocabulary
+
+    @property
+    def grid(self):
+        """
+        Last decoded grid
+        """
+        return self._grid
+
+    def decode(self, world_observations):
+        """
+        Decode the grid from the latest observations
+        :param world_observations: Dictionary of decoded observations (see MalmoEnvironment.world_observations)
+        :return: Integer array of shape (y, z, x), or None if the observations do not hold the grid
+        """
+        if world_observations is None:
+            return None
+
+        names = world_observations.get(self._name, None)
+        if names is None:
+            return None
+
+        assert len(names) == self._grid.size, \
+            'grid %s has %d blocks (expected %d)' % (self._name, len(names), self._grid.size)
+
+        # Most ticks leave the surroundings unchanged
+        if names != self._last_names:
+            self._vocabulary.ids(names, out=self._grid.reshape(-1))
+            self._last_names = list(names)
+            self._one_hot = None if self._one_hot is None else self._encode_one_hot(self._one_hot)
+
+        return self._grid
+
+    def one_hot(self):
+        """
+        One-hot encoding of the last decoded grid
+        :return: uint8 array of shape (y, z, x, vocabulary.max_size)
+        """
+        if self._one_hot is None:
+            self._one_hot = self._encode_one_hot(
+                np.empty(self._shape + (self._vocabulary.max_size,), dtype=np.uint8))
+        return self._one_hot
+
+    def _encode_one_hot(self, out):
+        flat = out.reshape(-1, self._vocabulary.max_size)
+        flat.fill(0)
+        flat[np.arange(flat.shape[0]), self._grid.reshape(-1)] = 1
+        return out
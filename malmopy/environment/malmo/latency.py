@@ -0,0 +1,178 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import json
+from datetime import datetime
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp_seconds(timestamp):
+    """
+    Convert a Malmo timestamp to seconds since the epoch, comparable with time.time().
+    Malmo stamps world state items with the UTC time at which the agent host received them.
+    :param timestamp: datetime (naive, UTC) or number of seconds
+    """
+    if isinstance(timestamp, datetime):
+        return (timestamp - EPOCH).total_seconds()
+    return float(timestamp)
+
+
+class LatencyHistogram(object):
+    """
+    Histogram of latencies, in milliseconds
+    """
+
+    # Upper bounds of the bins, in milliseconds. The last bin holds everything above
+    BINS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self._edges = np.array(self.BINS, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self._counts = np.zeros(len(self.BINS) + 1, dtype=np.int64)
+        self._count = 0
+        self._total = 0.
+        self._max = 0.
+
+    def record(self, seconds):
+        ms = seconds * 1000.
+        self._counts[np.searchsorted(self._edges, ms)] += 1
+        self._count += 1
+        self._total += ms
+        self._max = max(self._max, ms)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def counts(self):
+        return self._counts.copy()
+
+    @property
+    def mean(self):
+        return self._total / self._count if self._count > 0 else 0.
+
+    @property
+    def max(self):
+        return self._max
+
+    def percentile(self, q):
+        """
+        Upper bound of the bin holding the q-th percentile, in milliseconds (inf for the last bin)
+        :param q: Percentile in [0, 100]
+        """
+        if self._count == 0:
+            return 0.
+        index = int(np.searchsorted(np.cumsum(self._counts), q / 100. * self._count))
+        return float(self.BINS[index]) if index < len(self.BINS) else float('inf')
+
+    def as_dict(self):
+        return {'bins_ms': list(self.BINS), 'counts': self._counts.tolist(), 'count': self._count,
+                'mean_ms': self.mean, 'max_ms': self._max}
+
+
+class LatencyTracker(object):
+    """
+    Match the time each action was sent with the timestamps of the observations and video frames which follow.
+
+    Frames received before the last action was sent are stale: they show the world before the action.
+    """
+
+    def __init__(self):
+        self._observation = LatencyHistogram()
+        self._frame = LatencyHistogram()
+        self._sent_at = None
+        self._frames = 0
+        self._stale_frames = 0
+
+    def reset(self):
+        self._observation.reset()
+        self._frame.reset()
+        self._frames = 0
+        self._stale_frames = 0
+
+    @property
+    def sent_at(self):
+        """
+        time() at which the last action was sent, or None
+        """
+        return self._sent_at
+
+    def action_sent(self, sent_at):
+        self._sent_at = sent_at
+
+    def is_fresh(self, timestamp):
+        """
+        Check that a world state item was received after the last action was sent
+        """
+        return self._sent_at is None or timestamp_seconds(timestamp) >= self._sent_at
+
+    def record(self, snapshot):
+        """
+        Record the latencies of the observation and video frame of a snapshot
+        :return: True if the snapshot's video frame is stale
+        """
+        if self._sent_at is None:
+            return False
+
+        if snapshot.observation is not None and self.is_fresh(snapshot.observation.timestamp):
+            self._observation.record(timestamp_seconds(snapshot.observation.timestamp) - self._sent_at)
+
+        if snapshot.video_frame is None:
+            return False
+
+        self._frames += 1
+        if not self.is_fresh(snapshot.video_frame.timestamp):
+            self._stale_frames += 1
+            return True
+
+        self._frame.record(timestamp_seconds(snapshot.video_frame.timestamp) - self._sent_at)
+        return False
+
+    @property
+    def observation_latency(self):
+        return self._observation
+
+    @property
+    def frame_latency(self):
+        return self._frame
+
+    @property
+    def stale_frames(self):
+        return self._stale_frames
+
+    @property
+    def stale_ratio(self):
+        return self._stale_frames / float(self._frames) if self._frames > 0 else 0.
+
+    def as_dict(self):
+        return {'observation': self._observation.as_dict(), 'frame': self._frame.as_dict(),
+                'frames': self._frames, 'stale_frames': self._stale_frames}
+
+    def save(self, path):
+        """
+        Export the histograms as JSON
+        """
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
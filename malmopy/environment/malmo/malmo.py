@@ -17,17 +17,32 @@
 
 from __future__ import absolute_import
 
-import json
+import re
 import xml.etree.ElementTree
-from MalmoPython import AgentHost, ClientPool, ClientInfo, MissionSpec, MissionRecordSpec
-from collections import Sequence
-from time import sleep
+from threading import Condition
+from time import time
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
 
 import six
 from PIL import Image
-from numpy import zeros, log
+from numpy import frombuffer, uint8, zeros
 
+from ...util.preprocessing import FramePreprocessor
 from ..environment import VideoCapableEnvironment, StateBuilder
+from .backend import AgentHost, ClientPool, ClientInfo, MissionRecordSpec
+from .clients import ClientRegistry
+from .latency import LatencyTracker
+from .observations import ObservationParser
+from .recording import RecordingPolicy
+from .template import MissionTemplate
+from .wait import BackoffWaitStrategy, MissionStalledError, ResetStatistics, WaitStatistics, WaitStrategy, \
+    WaitTimeoutError, sleep_through
+
+DEFAULT_MS_PER_TICK = 50
 
 
 def allocate_remotes(remotes):
@@ -55,14 +70,156 @@ def allocate_remotes(remotes):
     return pool
 
 
+def remote_addresses(remotes):
+    """
+    Normalize remotes the same way as allocate_remotes()
+    :param remotes: tuple or array of tuples. Each tuple can be (), (ip,), (ip, port)
+    :return: List of (ip, port) tuples
+    """
+    if not isinstance(remotes, list):
+        remotes = [remotes]
+
+    addresses = []
+    for remote in remotes:
+        if isinstance(remote, ClientInfo):
+            addresses.append((remote.ip_address, remote.control_port))
+        elif isinstance(remote, Sequence):
+            if len(remote) == 0:
+                addresses.append(('localhost', 10000))
+            elif len(remote) == 1:
+                addresses.append((remote[0], 10000))
+            else:
+                addresses.append((remote[0], int(remote[1])))
+    return addresses
+
+
+def frame_to_array(video_frame):
+    """
+    Expose the pixels of a Malmo video frame as a read-only numpy array.
+    No copy is done when the pixel buffer supports the buffer protocol.
+    :param video_frame: Malmo TimestampedVideoFrame
+    :return: uint8 array of shape (height, width, channels)
+    """
+    try:
+        pixels = frombuffer(video_frame.pixels, dtype=uint8)
+    except TypeError:
+        # Pixel vectors exposed without the buffer protocol need a single copy
+        pixels = frombuffer(bytes(video_frame.pixels), dtype=uint8)
+
+    channels = getattr(video_frame, 'channels', 3)
+    pixels = pixels.reshape((video_frame.height, video_frame.width, channels))
+    pixels.flags.writeable = False
+    return pixels
+
+
+# Malmo lists the frames of all the video producers in video_frames, tagged with their frame type.
+# Recent versions also keep the frames of the other producers in separate lists
+VIDEO_FRAME_TYPE = 'VIDEO'
+VIDEO_FRAME_LISTS = ('video_frames', 'video_frames_colourmap', 'video_frames_luminance', 'video_frames_depthmap')
+
+
+def frame_type(video_frame):
+    """
+    :param video_frame: Malmo TimestampedVideoFrame
+    :return: Name of the frame type, e.g. 'VIDEO' or 'COLOUR_MAP'
+    """
+    # FrameType enums are printed either as VIDEO or FrameType.VIDEO
+    return str(getattr(video_frame, 'frametype', VIDEO_FRAME_TYPE)).rsplit('.', 1)[-1]
+
+
+# Reads the turn key without decoding the whole observation JSON
+TURN_KEY_PATTERN = re.compile(r'"turn_key"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def extract_turn_key(text):
+    """
+    Extract the turn key of a turn-based mission from an observation
+    :param text: Observation JSON
+    :return: Turn key, or None if the observation has none
+    """
+    match = TURN_KEY_PATTERN.search(text)
+    return match.group(1) if match is not None else None
+
+
 class TurnState(object):
+    """
+    Track the turns of a turn-based mission.
+
+    The turn key is read from each new observation once. Listeners are called, and threads blocked
+    in #wait() are woken up, as soon as a new turn begins. The time spent waiting between playing
+    a turn and the beginning of the next one is recorded in #statistics.
+    """
+
     def __init__(self):
-        self._turn_key = None
-        self._has_played = False
+        self._condition = Condition()
+        self._listeners = []
+        self._stats = WaitStatistics()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the current turn, e.g. when a new mission starts. Listeners and statistics are kept.
+        """
+        with self._condition:
+            self._turn_key = None
+            self._has_played = False
+            self._timestamp = None
+            self._played_at = None
+            self._observations = 0
+
+    def observe(self, observation):
+        """
+        Update the turn from an observation
+        :param observation: Malmo TimestampedString holding the observation JSON
+        """
+        if observation.timestamp == self._timestamp:
+            return
+        self._timestamp = observation.timestamp
+        self._observations += 1
+
+        key = extract_turn_key(observation.text)
+        if key is not None and key != self._turn_key:
+            self.update(key)
 
     def update(self, key):
-        self._has_played = False
-        self._turn_key = key
+        with self._condition:
+            if self._played_at is not None:
+                self._stats.record(self._observations, time() - self._played_at)
+                self._played_at = None
+            self._observations = 0
+            self._has_played = False
+            self._turn_key = key
+            self._condition.notify_all()
+
+        for listener in self._listeners:
+            listener(key)
+
+    def add_listener(self, listener):
+        """
+        :param listener: Callable(turn_key) called when a new turn begins
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def wait(self, timeout=None):
+        """
+        Block the calling thread until the agent can play
+        :param timeout: Number of seconds after which to give up waiting (None waits forever)
+        :return: True if the agent can play
+        """
+        with self._condition:
+            if not self.can_play:
+                self._condition.wait(timeout)
+            return self.can_play
+
+    @property
+    def statistics(self):
+        """
+        Time spent between playing a turn and the beginning of the next one, polls being the observations received
+        """
+        return self._stats
 
     @property
     def can_play(self):
@@ -79,6 +236,119 @@ class TurnState(object):
     @has_played.setter
     def has_played(self, value):
         self._has_played = bool(value)
+        if self._has_played:
+            self._played_at = time()
+
+
+class WorldStateSnapshot(object):
+    """
+    Consistent view of a Malmo WorldState, captured once per step.
+
+    All the values exposed come from the same world state, hence from the same tick.
+    The latest observation and video frame are carried over from the previous snapshot
+    when the world state does not hold new ones.
+    """
+
+    def __init__(self, world_state, previous=None, parser=None):
+        """
+        :param world_state: Malmo WorldState, or None for a mission which was aborted
+        :param previous: Previous snapshot of the same mission
+        :param parser: ObservationParser shared with the environment
+        """
+        self._parser = parser if parser is not None else ObservationParser()
+
+        if world_state is None:
+            # Aborted missions end right away, keeping the last observation and video frame
+            self._has_mission_begun = True
+            self._is_mission_running = False
+            self._reward = 0
+            self._ticks = 0
+            self._mission_control_messages = []
+            self._observation = previous.observation if previous is not None else None
+            self._video_frames = dict(previous.video_frames) if previous is not None else {}
+            return
+
+        self._has_mission_begun = world_state.has_mission_begun
+        self._is_mission_running = world_state.is_mission_running
+        self._reward = sum([reward.getValue() for reward in world_state.rewards])
+        self._ticks = world_state.number_of_observations_since_last_state
+        self._mission_control_messages = list(world_state.mission_control_messages)
+
+        if len(world_state.observations) > 0:
+            self._observation = world_state.observations[-1]
+        else:
+            self._observation = previous.observation if previous is not None else None
+
+        # Latest frame of each frame type, frame types without new frames keep the previous one
+        self._video_frames = dict(previous.video_frames) if previous is not None else {}
+        for frames in VIDEO_FRAME_LISTS:
+            for video_frame in getattr(world_state, frames, ()):
+                self._video_frames[frame_type(video_frame)] = video_frame
+
+    @property
+    def has_mission_begun(self):
+        return self._has_mission_begun
+
+    @property
+    def is_mission_running(self):
+        return self._is_mission_running
+
+    @property
+    def done(self):
+        return self._has_mission_begun and not self._is_mission_running
+
+    @property
+    def ticks(self):
+        """
+        Number of observations (i.e. ticks) received since the previous snapshot
+        """
+        return self._ticks
+
+    @property
+    def reward(self):
+        """
+        Sum of the rewards received since the previous snapshot
+        """
+        return self._reward
+
+    @property
+    def mission_control_messages(self):
+        return self._mission_control_messages
+
+    @property
+    def observation(self):
+        """
+        Latest raw observation (TimestampedString), or None
+        """
+        return self._observation
+
+    @property
+    def video_frame(self):
+        """
+        Latest frame of the VideoProducer (TimestampedVideoFrame), or None
+        """
+        return self._video_frames.get(VIDEO_FRAME_TYPE, None)
+
+    @property
+    def video_frames(self):
+        """
+        Dictionary mapping each frame type (e.g. 'VIDEO', 'COLOUR_MAP') to its latest TimestampedVideoFrame
+        """
+        return self._video_frames
+
+    @property
+    def world_observations(self):
+        """
+        Latest observation decoded from JSON, or None
+        """
+        return self._parser.parse(self._observation)
+
+    @property
+    def observation_record(self):
+        """
+        Latest observation projected on the parser's schema, or None
+        """
+        return self._parser.project(self._observation)
 
 
 class MalmoStateBuilder(StateBuilder):
@@ -105,18 +375,13 @@ class MalmoRGBStateBuilder(MalmoStateBuilder):
         self._width = width
         self._height = height
         self._gray = bool(grayscale)
+        self._preprocessor = FramePreprocessor(width, height, grayscale)
 
     def build(self, environment):
-        import numpy as np
-
-        img = environment.frame
+        frame = environment.frame_array
 
-        if img is not None:
-            img = img.resize((self._width, self._height))
-
-            if self._gray:
-                img = img.convert('L')
-            return np.array(img)
+        if frame is not None:
+            return self._preprocessor.process(frame)
         else:
             return zeros((self._width, self._height, 1 if self._gray else 3)).squeeze()
 
@@ -143,16 +408,31 @@ class MalmoEnvironment(VideoCapableEnvironment):
     """
 
     MAX_START_MISSION_RETRY = 50
+    START_MISSION_MIN_DELAY = .05
+    START_MISSION_MAX_DELAY = 2.
+    MISSION_START_TIMEOUT = 300
+    STEP_TIMEOUT = 60
+    MAX_FAILOVERS = 3
+    STALLED_END_RESULT = 'Client stalled'
 
     def __init__(self, mission, actions, remotes,
                  role=0, exp_name="", turn_based=False,
-                 recording_path=None, force_world_reset=False):
+                 recording_path=None, force_world_reset=False, wait_strategy=None, observation_schema=None,
+                 pipeline_reset=False, start_barrier=None, client_registry=None, stall_timeout_ticks=None,
+                 recording_policy=None, wait_for_fresh_frame=False):
 
-        assert isinstance(mission, six.string_types), "mission should be a string"
+        assert isinstance(mission, (six.string_types, MissionTemplate)), \
+            "mission should be a string or a MissionTemplate"
+        assert stall_timeout_ticks is None or stall_timeout_ticks > 0, 'stall_timeout_ticks should be > 0'
         super(MalmoEnvironment, self).__init__()
 
         self._agent = AgentHost()
-        self._mission = MissionSpec(mission, True)
+
+        # Missions are validated once by the template, then a MissionSpec is created for each episode
+        if not isinstance(mission, MissionTemplate):
+            mission = MissionTemplate(mission)
+        self._template = mission
+        self._mission = None
 
         # validate actions
         self._actions = actions
@@ -170,18 +450,74 @@ class MalmoEnvironment(VideoCapableEnvironment):
         else:
             self._recorder = MissionRecordSpec()
 
+        # A recording policy replaces recording_path, deciding which episodes are recorded, and where
+        assert recording_policy is None or isinstance(recording_policy, RecordingPolicy), \
+            'recording_policy should be an instance of RecordingPolicy'
+        self._recording_policy = recording_policy
+        self._recording_path = None
+        self._evaluating = False
+        self._episode_return = 0.
+
+        # Latencies between sending an action and receiving the observation and frame which follow it.
+        # Optionally keep waiting until a frame rendered after the action is received.
+        self._latency = LatencyTracker()
+        self._frame_is_stale = False
+        self._step_ticks = 0
+        self._wait_for_fresh_frame = bool(wait_for_fresh_frame) and self._template.video_size(role) is not None
+
         self._clients = allocate_remotes(remotes)
 
-        self._force_world_reset = force_world_reset
+        # Clients can also be leased from a registry shared between processes (see ClientRegistry).
+        # Role 0 of a multi-agent mission reserves a client for each agent from the pool it is given,
+        # so these missions are always started on the full pool.
+        lease_clients = self._template.agent_count == 1
+        self._client_registry = client_registry if lease_clients else None
+        self._client_lease = None
+
+        # Watchdog: a client sending no observation for stall_timeout_ticks ticks is considered hung.
+        # The mission is then aborted and the next one started on another client, leased from a registry.
+        ms_per_tick = self._template.ms_per_tick or DEFAULT_MS_PER_TICK
+        self._stall_timeout_ticks = stall_timeout_ticks
+        self._stall_timeout = None
+        if stall_timeout_ticks is not None:
+            self._stall_timeout = stall_timeout_ticks * ms_per_tick / 1000.
+            if self._client_registry is None and lease_clients:
+                self._client_registry = ClientRegistry(remote_addresses(remotes))
+
+        # True regenerates the world for every mission, an integer N for every Nth mission. Otherwise Minecraft keeps
+        # the world as long as the world generator is unchanged, and only the decorators are applied again.
+        assert force_world_reset >= 0, 'force_world_reset should be a boolean or an integer >= 0'
+        self._world_reset_interval = int(force_world_reset)
         self._role = role
         self._exp_name = exp_name
         self._turn_based = bool(turn_based)
         self._turn = TurnState()
 
-        self._world = None
-        self._world_obs = None
+        # Other agents can hold the turn for an unbounded time, so turn-based steps never time out by default
+        if wait_strategy is None:
+            wait_strategy = BackoffWaitStrategy(ms_per_tick,
+                                                timeout=None if self._turn_based else self.STEP_TIMEOUT)
+        assert isinstance(wait_strategy, WaitStrategy), 'wait_strategy should inherit from WaitStrategy'
+        self._wait = wait_strategy
+        self._parser = ObservationParser(observation_schema)
+
+        # Request the next mission as soon as the current one ends, instead of waiting for reset()
+        self._pipeline_reset = bool(pipeline_reset)
+        self._mission_requested = False
+        self._mission_requested_in = 0.
+        self._reset_stats = ResetStatistics()
+
+        # Multi-agent missions: roles > 0 wait for role 0 to start each mission (see MissionStartBarrier)
+        self._start_barrier = start_barrier
+        self._mission_count = 0
+
+        self._snapshot = None
+        self._frame_array = None
+        self._frame_array_timestamp = None
+        self._frame_image = None
+        self._frame_image_key = None
+        self._frame_arrays = {}
         self._previous_action = None
-        self._last_frame = None
         self._action_count = None
         self._end_result = None
 
@@ -199,12 +535,21 @@ class MalmoEnvironment(VideoCapableEnvironment):
 
     @property
     def reward(self):
-        return 0.
+        """
+        Sum of the rewards received for the last action
+        """
+        return self._reward
 
     @property
     def done(self):
-        latest_ws = self._agent.peekWorldState()
-        return latest_ws.has_mission_begun and not latest_ws.is_mission_running
+        return self._snapshot is not None and self._snapshot.done
+
+    @property
+    def snapshot(self):
+        """
+        World state snapshot captured at the end of the last step
+        """
+        return self._snapshot
 
     @property
     def action_count(self):
@@ -214,16 +559,56 @@ class MalmoEnvironment(VideoCapableEnvironment):
     def previous_action(self):
         return self._previous_action
 
+    @property
+    def frame_array(self):
+        """
+        Return the most recent frame as a read-only numpy view over the frame's pixel buffer
+        :return: uint8 array of shape (height, width, channels), or None if no frame was received yet
+        """
+        last_frame = self._snapshot.video_frame if self._snapshot is not None else None
+        if last_frame is None:
+            return None
+
+        if self._frame_array is None or self._frame_array_timestamp != last_frame.timestamp:
+            self._frame_array = frame_to_array(last_frame)
+            self._frame_array_timestamp = last_frame.timestamp
+
+        return self._frame_array
+
+    def video_frame_array(self, frame_type):
+        """
+        Return the most recent frame of a video producer as a read-only numpy view over its pixel buffer
+        :param frame_type: Name of the frame type, e.g. 'COLOUR_MAP' for the ColourMapProducer
+        :return: uint8 array of shape (height, width, channels), or None if no such frame was received yet
+        """
+        if frame_type == VIDEO_FRAME_TYPE:
+            return self.frame_array
+
+        last_frame = self._snapshot.video_frames.get(frame_type, None) if self._snapshot is not None else None
+        if last_frame is None:
+            return None
+
+        timestamp, pixels = self._frame_arrays.get(frame_type, (None, None))
+        if pixels is None or timestamp != last_frame.timestamp:
+            pixels = frame_to_array(last_frame)
+            self._frame_arrays[frame_type] = (last_frame.timestamp, pixels)
+        return pixels
+
     @property
     def frame(self):
-        latest_ws = self._agent.peekWorldState()
+        pixels = self.frame_array
+        if pixels is None:
+            return None
 
-        if hasattr(latest_ws, 'video_frames') and len(latest_ws.video_frames) > 0:
-            self._last_frame = latest_ws.video_frames[-1]
+        # Subclasses can return another buffer from frame_array for the same video frame
+        key = (id(pixels), self._frame_array_timestamp)
+        if self._frame_image is None or self._frame_image_key != key:
+            if pixels.shape[2] != 3:
+                pixels = pixels[:, :, :3]
+            self._frame_image = Image.fromarray(pixels)
+            self._frame_image_key = key
 
-        return Image.frombytes('RGB',
-                               (self._last_frame.width, self._last_frame.height),
-                               bytes(self._last_frame.pixels))
+        return self._frame_image
 
     @property
     def recording(self):
@@ -234,20 +619,123 @@ class MalmoEnvironment(VideoCapableEnvironment):
         self._recording = bool(val)
 
         if self.recording:
-            if not self._mission.isVideoRequested(0):
+            if self._mission is not None and not self._mission.isVideoRequested(0):
                 self._mission.requestVideo(212, 160)
 
+    @property
+    def evaluating(self):
+        """
+        The agent is evaluating its policy, and not training (see RecordingPolicy)
+        """
+        return self._evaluating
+
+    @evaluating.setter
+    def evaluating(self, value):
+        self._evaluating = bool(value)
+
+    @property
+    def episode_return(self):
+        """
+        Sum of the rewards received since the beginning of the episode
+        """
+        return self._episode_return
+
+    @property
+    def recording_path(self):
+        """
+        Path the current episode is recorded to by the recording policy, or None
+        """
+        return self._recording_path
+
+    @property
+    def latency(self):
+        """
+        LatencyTracker holding the action to observation and action to frame latency histograms
+        """
+        return self._latency
+
+    @property
+    def step_ticks(self):
+        """
+        Number of ticks elapsed during the last step, including those which went by before the action was sent
+        """
+        return self._step_ticks
+
+    @property
+    def frame_is_stale(self):
+        """
+        The current frame was received before the last action was sent
+        """
+        return self._frame_is_stale
+
+    @property
+    def world_reset_interval(self):
+        """
+        The world is regenerated every world_reset_interval missions, 0 meaning that it is reused
+        """
+        return self._world_reset_interval
+
+    @property
+    def mission_template(self):
+        return self._template
+
     @property
     def is_turn_based(self):
         return self._turn_based
 
+    @property
+    def turn(self):
+        """
+        TurnState of turn-based missions, e.g. to be notified when a turn begins
+        """
+        return self._turn
+
+    @property
+    def wait_strategy(self):
+        return self._wait
+
+    @property
+    def reset_statistics(self):
+        """
+        Time spent in each phase of the mission resets
+        """
+        return self._reset_stats
+
+    @property
+    def wait_statistics(self):
+        """
+        Number of polls and time spent waiting for each world state update
+        """
+        return self._wait.statistics
+
     @property
     def world_observations(self):
-        latest_ws = self._agent.peekWorldState()
-        if latest_ws.number_of_observations_since_last_state > 0:
-            self._world_obs = json.loads(latest_ws.observations[-1].text)
+        return self._snapshot.world_observations if self._snapshot is not None else None
+
+    @property
+    def observation_schema(self):
+        return self._parser.schema
 
-        return self._world_obs
+    @observation_schema.setter
+    def observation_schema(self, value):
+        self._parser.schema = value
+
+    @property
+    def observation_record(self):
+        """
+        Latest observation reduced to the fields declared by the observation schema
+        :return: Schema record, or None if no schema was set or no observation was received yet
+        """
+        return self._snapshot.observation_record if self._snapshot is not None else None
+
+    def refresh(self):
+        """
+        Replace the current snapshot with the latest world state available, without consuming it.
+        Only use this when values fresher than the last step are really needed.
+        :return: The new snapshot
+        """
+        self._snapshot = WorldStateSnapshot(self._agent.peekWorldState(), self._snapshot, self._parser)
+        return self._snapshot
 
     def _ready_to_act(self, world_state):
         if not self._turn_based:
@@ -257,14 +745,46 @@ class MalmoEnvironment(VideoCapableEnvironment):
                 return False
 
             if world_state.number_of_observations_since_last_state > 0:
-                data = json.loads(world_state.observations[-1].text)
-                turn_key = data.get(u'turn_key', None)
-
-                if turn_key is not None and turn_key != self._turn.key:
-                    self._turn.update(turn_key)
+                self._turn.observe(world_state.observations[-1])
             return self._turn.can_play
 
     def do(self, action_id):
+        sleep_through(self.iter_do(action_id))
+        return self.state, self._reward, self.done
+
+    def iter_do(self, action_id):
+        """
+        Non-blocking version of #do(). Send the action, then yield the number of seconds to wait
+        before resuming the generator, until the next world state is received.
+        Once the generator is exhausted, the outcome is available from #state, #reward and #done.
+        """
+        self._send_action(action_id)
+        self._latency.action_sent(time())
+        for delay in self._iter_step_obs():
+            yield delay
+        self._reward = self._snapshot.reward
+        self._step_ticks = self._snapshot.ticks
+        self._episode_return += self._reward
+
+        if self.done:
+            self._end_episode()
+
+    def _end_episode(self):
+        """
+        Called once the mission is over, before the next one is requested
+        """
+        if self._recording_path is not None:
+            self._recording_policy.finish_episode(self._recording_path, self._episode_return, self._evaluating)
+            self._recording_path = None
+
+        if self._pipeline_reset:
+            self._request_next_mission()
+
+    def _send_action(self, action_id):
+        """
+        Send the command(s) corresponding to the specified action, without waiting for the next world state.
+        @override to customize how actions are mapped to Malmo commands
+        """
         assert 0 <= action_id <= self.available_actions, \
             "action %d is not valid (should be in [0, %d[)" % (action_id,
                                                                self.available_actions)
@@ -282,52 +802,256 @@ class MalmoEnvironment(VideoCapableEnvironment):
             self._previous_action = action
             self._action_count += 1
 
-        self._await_next_obs()
-        return self.state, sum([reward.getValue() for reward in self._world.rewards]), self.done
-
     def reset(self):
+        sleep_through(self.iter_reset())
+        return self.state
+
+    def iter_reset(self):
+        """
+        Non-blocking version of #reset(). Start a new mission, then yield the number of seconds to wait
+        before resuming the generator, until the mission has begun.
+        Once the generator is exhausted, the first state is available from #state.
+        """
         super(MalmoEnvironment, self).reset()
 
-        if self._force_world_reset:
-            self._mission.forceWorldReset()
+        # With the watchdog enabled, missions which fail to begin are started again on another client
+        failovers = self.MAX_FAILOVERS if self._stall_timeout is not None else 0
+        for attempt in range(failovers + 1):
+            try:
+                for delay in self._iter_begin_mission():
+                    yield delay
+                break
+            except WaitTimeoutError:
+                if attempt == failovers:
+                    raise
+                self._fail_over()
 
-        self._world = None
-        self._world_obs = None
+    def _iter_begin_mission(self):
+        """
+        Yield the delays to wait until a new mission has begun and its first observation is received
+        """
+        self._snapshot = None
         self._previous_action = None
         self._action_count = 0
-        self._turn = TurnState()
+        self._turn.reset()
         self._end_result = None
+        self._episode_return = 0.
+        self._latency.action_sent(None)
+
+        started_at = time()
+        if not self._mission_requested:
+            for delay in self._iter_start_mission():
+                yield delay
+            self._mission_requested_in = time() - started_at
+        self._mission_requested = False
+        requested_at = time()
+
+        # wait for mission to begin
+        self._wait.start(self.MISSION_START_TIMEOUT)
+        while not self._agent.peekWorldState().has_mission_begun:
+            yield self._wait.next_delay()
+        self._wait.stop()
+        begun_at = time()
+
+        # wait for the first observation
+        for delay in self._iter_next_obs(timeout=self.MISSION_START_TIMEOUT):
+            yield delay
+
+        self._reset_stats.record(self._mission_requested_in, begun_at - requested_at, time() - begun_at)
+
+        if self._client_lease is not None:
+            self._client_registry.report_success(self._client_lease, self._reset_stats.last_time)
+
+    def close(self):
+        """
+        Give back the client leased from the client registry, if any
+        """
+        self._release_client()
+
+        if self._recording_policy is not None:
+            self._recording_policy.close()
+
+    def _release_client(self):
+        if self._client_lease is not None:
+            self._client_registry.release(self._client_lease)
+            self._client_lease = None
+
+    @property
+    def client(self):
+        """
+        (ip, port) of the client leased from the client registry, or None
+        """
+        return self._client_lease
+
+    @property
+    def ms_per_tick(self):
+        """
+        Tick duration of the next missions in milliseconds. Setting it also retunes the delays which depend on it
+        (wait strategy and watchdog timeout)
+        """
+        return self._template.ms_per_tick or DEFAULT_MS_PER_TICK
 
-        # Wait for the server (role = 0) to start
-        sleep(.5)
+    @ms_per_tick.setter
+    def ms_per_tick(self, value):
+        assert value > 0, 'ms_per_tick should be > 0'
 
+        self._template.ms_per_tick = value
+        self._wait.tune(value)
+        if self._stall_timeout_ticks is not None:
+            self._stall_timeout = self._stall_timeout_ticks * value / 1000.
+
+    @property
+    def stall_timeout(self):
+        """
+        Number of seconds without observation after which the watchdog aborts a mission, or None if disabled
+        """
+        return self._stall_timeout
+
+    def _fail_over(self):
+        """
+        Give up on the current client: report it as stalled and drop the agent host bound to it,
+        so that the next mission is started on another client, or on the same one if there is no other.
+        """
+        if self._client_lease is not None:
+            self._client_registry.report_failure(self._client_lease, stalled=True)
+            self._release_client()
+
+        # The agent host of a hung mission may never see it end, and would prevent starting the next one
+        self._agent = AgentHost()
+        self._mission_requested = False
+
+        if self._recording_path is not None:
+            self._recording_policy.finish_episode(self._recording_path, self._episode_return, self._evaluating)
+            self._recording_path = None
+
+    def _abort_stalled_mission(self):
+        """
+        End the current episode as if the mission was over, without raising to the agent
+        """
+        self._fail_over()
+        self._end_result = self.STALLED_END_RESULT
+        self._snapshot = WorldStateSnapshot(None, self._snapshot, self._parser)
+
+    def _start_mission(self):
+        # MissionSpec and recording are prepared once per mission, start retries reuse them
+        if self._mission is None:
+            self._mission = self._template.create_mission_spec(self._mission_count)
+            if self._recording_policy is not None:
+                self._recording_path = self._recording_policy.start_episode(self._evaluating)
+                self._recorder = self._recording_policy.record_spec(self._recording_path)
+        if self._world_reset_interval > 0 and self._mission_count % self._world_reset_interval == 0:
+            self._mission.forceWorldReset()
+        if self.recording and not self._mission.isVideoRequested(0):
+            self._mission.requestVideo(212, 160)
+
+        clients = self._clients
+        if self._client_registry is not None:
+            self._release_client()
+            # Without a spare client, a client which failed is tried again as soon as it accepts connections.
+            # When all the clients are leased, the start is retried until another environment releases one.
+            self._client_lease = self._client_registry.acquire(fallback=True)
+            if self._client_lease is None:
+                raise Exception('No free healthy Minecraft client available')
+            clients = allocate_remotes([self._client_lease])
+
+        try:
+            self._agent.startMission(self._mission,
+                                     clients,
+                                     self._recorder,
+                                     self._role,
+                                     self._exp_name)
+        except Exception:
+            if self._client_lease is not None:
+                self._client_registry.report_failure(self._client_lease)
+                self._release_client()
+            raise
+        self._mission_count += 1
+        self._mission = None
+
+        if self._start_barrier is not None and self._role == 0:
+            self._start_barrier.announce(self._mission_count)
+
+    def _iter_start_mission(self):
+        """
+        Yield the delays to wait until the mission start request is accepted by a client
+        """
+        # A new mission can only be started once the previous one is over
+        self._wait.start(self.MISSION_START_TIMEOUT)
+        while self._agent.peekWorldState().is_mission_running:
+            yield self._wait.next_delay()
+        self._wait.stop()
+
+        if self._start_barrier is not None and self._role != 0:
+            self._wait.start(self.MISSION_START_TIMEOUT)
+            try:
+                while not self._start_barrier.is_announced(self._mission_count + 1):
+                    yield self._wait.next_delay()
+            except WaitTimeoutError:
+                # Role 0 may have restarted or died, fall back to retrying startMission
+                pass
+            self._wait.stop()
+
+        # Clients which are not ready yet (e.g. waiting for the server of role 0) are probed again shortly
+        delay = self.START_MISSION_MIN_DELAY
         for i in range(MalmoEnvironment.MAX_START_MISSION_RETRY):
             try:
-                self._agent.startMission(self._mission,
-                                         self._clients,
-                                         self._recorder,
-                                         self._role,
-                                         self._exp_name)
+                self._start_mission()
                 break
             except Exception as e:
                 if i == MalmoEnvironment.MAX_START_MISSION_RETRY - 1:
                     raise Exception("Unable to connect after %d tries %s" %
                                        (self.MAX_START_MISSION_RETRY, e))
                 else:
-                    sleep(log(i + 1) + 1)
-
-        # wait for mission to begin
-        self._await_next_obs()
-        return self.state
+                    yield delay
+                    delay = min(delay * 2, self.START_MISSION_MAX_DELAY)
 
-    def _await_next_obs(self):
+    def _request_next_mission(self):
+        """
+        Try once to start the next mission right after the current one ended. On failure reset() starts it.
+        """
+        if self._start_barrier is not None and self._role != 0 \
+                and not self._start_barrier.is_announced(self._mission_count + 1):
+            return
+
+        started_at = time()
+        try:
+            self._start_mission()
+        except Exception:
+            return
+        self._mission_requested = True
+        self._mission_requested_in = time() - started_at
+
+    def _await_next_obs(self, timeout=None):
         """
         Ensure that an update to the world state is received
+        :param timeout: Override the wait strategy's timeout for this wait
         :return:
         """
+        sleep_through(self._iter_next_obs(timeout))
+
+    def _iter_step_obs(self):
+        """
+        Same as #_iter_next_obs(), aborting the mission if the watchdog detects that the client stalled
+        """
+        try:
+            for delay in self._iter_next_obs(stall_timeout=self._stall_timeout):
+                yield delay
+        except MissionStalledError:
+            self._abort_stalled_mission()
+
+    def _iter_next_obs(self, timeout=None, stall_timeout=None):
+        """
+        Yield the delays to wait between two polls until an update to the world state is received
+        :param timeout: Override the wait strategy's timeout for this wait
+        :param stall_timeout: Raise MissionStalledError when no new observation arrives for this number of seconds
+        """
         # Wait until we have everything we need
+        self._wait.start(timeout)
         current_state = self._agent.peekWorldState()
-        while not self.is_valid(current_state) or not self._ready_to_act(current_state):
+        observations = current_state.number_of_observations_since_last_state
+        observed_at = time()
+        while not self.is_valid(current_state) or not self._ready_to_act(current_state) \
+                or not self._has_fresh_frame(current_state):
 
             if current_state.has_mission_begun and not current_state.is_mission_running:
                 if not current_state.is_mission_running and len(current_state.mission_control_messages) > 0:
@@ -338,20 +1062,34 @@ class MalmoEnvironment(VideoCapableEnvironment):
                     self._end_result = hr_stat
                 break
 
-            # Peek fresh world state from socket
+            # Back off before peeking a fresh world state from socket
+            yield self._wait.next_delay()
             current_state = self._agent.peekWorldState()
 
+            # Observations keep flowing while waiting for the turn of other agents, only silence is a stall
+            if stall_timeout is not None:
+                if current_state.number_of_observations_since_last_state != observations:
+                    observations = current_state.number_of_observations_since_last_state
+                    observed_at = time()
+                elif time() - observed_at > stall_timeout:
+                    self._wait.stop()
+                    raise MissionStalledError(time() - observed_at, observations)
+
+        self._wait.stop()
+
         # Flush current world as soon as we have the entire state
-        self._world = self._agent.getWorldState()
+        self._snapshot = WorldStateSnapshot(self._agent.getWorldState(), self._snapshot, self._parser)
+        self._frame_is_stale = self._latency.record(self._snapshot)
 
-        if self._world.is_mission_running:
-            new_world = json.loads(self._world.observations[-1].text)
-            if new_world is not None:
-                self._world_obs = new_world
+    def _has_fresh_frame(self, world_state):
+        if not self._wait_for_fresh_frame or self._latency.sent_at is None:
+            return True
 
-        # Update video frames if any
-        if hasattr(self._world, 'video_frames') and len(self._world.video_frames) > 0:
-            self._last_frame = self._world.video_frames[-1]
+        # Frames of the other producers (e.g. colour map) are listed along with the VideoProducer's
+        for video_frame in reversed(world_state.video_frames):
+            if frame_type(video_frame) == VIDEO_FRAME_TYPE:
+                return self._latency.is_fresh(video_frame.timestamp)
+        return False
 
     def is_valid(self, world_state):
         """
@@ -0,0 +1,123 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import json
+from collections import namedtuple
+
+
+class ObservationSchema(object):
+    """
+    Declare the observation fields a state builder needs, along with their types.
+
+    Parsed observations are projected on these fields into a compact namedtuple record.
+    Fields missing from an observation are set to None.
+    """
+
+    def __init__(self, fields, name='Observation'):
+        """
+        :param fields: Sequence of (key, type) pairs, type being a callable converting the JSON value
+        :param name: Name of the generated record type
+        """
+        assert fields is not None and len(fields) > 0, 'schema should declare at least 1 field'
+
+        self._keys = tuple(key for key, _ in fields)
+        self._types = tuple(field_type for _, field_type in fields)
+        self._record = namedtuple(name, self._keys, rename=True)
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def record_type(self):
+        return self._record
+
+    def project(self, data):
+        """
+        Extract the declared fields from a decoded observation
+        :param data: Dictionary decoded from the observation JSON
+        :return: Record holding the declared fields
+        """
+        values = []
+        for key, field_type in zip(self._keys, self._types):
+            value = data.get(key, None)
+            values.append(field_type(value) if value is not None else None)
+        return self._record(*values)
+
+
+class ObservationParser(object):
+    """
+    Decode Malmo JSON observations once per observation id.
+
+    Observations are identified by their timestamp, so the same observation read by the
+    environment, the turn tracking and the state builder during a step is decoded only once.
+    """
+
+    def __init__(self, schema=None):
+        assert schema is None or isinstance(schema, ObservationSchema), \
+            'schema should be an instance of ObservationSchema'
+
+        self._schema = schema
+        self._key = None
+        self._data = None
+        self._record = None
+
+    @property
+    def schema(self):
+        return self._schema
+
+    @schema.setter
+    def schema(self, value):
+        assert value is None or isinstance(value, ObservationSchema), \
+            'schema should be an instance of ObservationSchema'
+        self._schema = value
+        self._record = None
+
+    def _update(self, observation):
+        key = observation.timestamp
+        if self._data is None or key != self._key:
+            self._data = json.loads(observation.text)
+            self._key = key
+            self._record = None
+
+    def parse(self, observation):
+        """
+        Decode an observation
+        :param observation: Malmo TimestampedString holding the observation JSON
+        :return: Dictionary, or None if observation is None
+        """
+        if observation is None:
+            return None
+
+        self._update(observation)
+        return self._data
+
+    def project(self, observation):
+        """
+        Decode an observation and extract the fields declared by the schema
+        :param observation: Malmo TimestampedString holding the observation JSON
+        :return: Schema record, or None if observation is None or there is no schema
+        """
+        if observation is None or self._schema is None:
+            return None
+
+        self._update(observation)
+        if self._record is None:
+            self._record = self._schema.project(self._data)
+        return self._record
@@ -0,0 +1,177 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import os
+from time import strftime, time
+
+from .backend import MissionRecordSpec
+
+
+class RecordingPolicy(object):
+    """
+    Decide which episodes are recorded, and keep the recordings within a disk budget.
+
+    An episode is recorded when any of the following rules selects it:
+     - every: every Nth episode
+     - evaluation: episodes run while the environment is evaluating
+     - min_return / max_return: episodes whose return ends up >= min_return or <= max_return.
+       The return is only known at the end, so every episode is recorded and the others are deleted afterwards.
+
+    Recordings are named <prefix>_<episode>_<date>.tgz. Once the total size of the recordings with this prefix
+    exceeds max_bytes, the oldest ones are deleted. Use a different prefix for each agent sharing a directory.
+    Recordings which do not appear within grace_period seconds after their episode finished (e.g. of an aborted
+    or stalled mission) are not waited for anymore.
+    """
+
+    def __init__(self, directory, prefix='episode', every=None, evaluation=False, min_return=None, max_return=None,
+                 max_bytes=None, record_video=True, fps=12, bit_rate=400000, grace_period=300.):
+        """
+        :param directory: Directory holding the recordings, created if needed
+        :param prefix: Prefix of the recording file names
+        :param every: Record one episode out of every (None disables this rule)
+        :param evaluation: Record the evaluation episodes
+        :param min_return: Keep the episodes whose return is >= min_return
+        :param max_return: Keep the episodes whose return is <= max_return
+        :param max_bytes: Disk budget of the recordings with this prefix (None is unbounded)
+        :param record_video: Record the MP4 video along with the commands, rewards and observations
+        :param grace_period: Number of seconds to wait for Malmo to write a recording once its episode finished
+        """
+        assert every is None or every > 0, 'every should be > 0'
+        assert max_bytes is None or max_bytes > 0, 'max_bytes should be > 0'
+        assert grace_period >= 0, 'grace_period should be >= 0'
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._directory = directory
+        self._prefix = prefix
+        self._every = every
+        self._evaluation = bool(evaluation)
+        self._min_return = min_return
+        self._max_return = max_return
+        self._max_bytes = max_bytes
+        self._record_video = bool(record_video)
+        self._fps = fps
+        self._bit_rate = bit_rate
+        self._grace_period = grace_period
+
+        self._episodes = 0
+        self._pending = []
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def episodes(self):
+        return self._episodes
+
+    @property
+    def _filters_on_return(self):
+        return self._min_return is not None or self._max_return is not None
+
+    def start_episode(self, evaluating=False):
+        """
+        Decide whether the next episode is recorded
+        :param evaluating: The episode is an evaluation episode
+        :return: Path of the recording, or None if the episode is not recorded
+        """
+        episode = self._episodes
+        self._episodes += 1
+        self._collect()
+
+        if (self._every is not None and episode % self._every == 0) \
+                or (self._evaluation and evaluating) or self._filters_on_return:
+            return os.path.join(self._directory, '%s_%06d_%s.tgz' % (self._prefix, episode,
+                                                                     strftime('%Y%m%d-%H%M%S')))
+        return None
+
+    def record_spec(self, path):
+        """
+        :param path: Path returned by #start_episode()
+        :return: MissionRecordSpec recording to path, or recording nothing if path is None
+        """
+        if path is None:
+            return MissionRecordSpec()
+
+        recorder = MissionRecordSpec(path)
+        recorder.recordCommands()
+        if self._record_video:
+            recorder.recordMP4(self._fps, self._bit_rate)
+        recorder.recordRewards()
+        recorder.recordObservations()
+        return recorder
+
+    def finish_episode(self, path, episode_return, evaluating=False):
+        """
+        Decide whether a recording is kept. Malmo may still be writing it, so it is only deleted
+        or evicted during a later call, once it exists.
+        :param path: Path returned by #start_episode()
+        :param episode_return: Sum of the rewards of the episode
+        :param evaluating: The episode was an evaluation episode
+        """
+        if path is None:
+            return
+
+        keep = not self._filters_on_return \
+            or (self._min_return is not None and episode_return >= self._min_return) \
+            or (self._max_return is not None and episode_return <= self._max_return) \
+            or (self._evaluation and evaluating) \
+            or (self._every is not None and self._episode_index(path) % self._every == 0)
+        self._pending.append((path, keep, time()))
+        self._collect()
+
+    def close(self):
+        """
+        Apply the pending decisions on the recordings already written
+        """
+        self._collect()
+
+    def _episode_index(self, path):
+        return int(os.path.basename(path)[len(self._prefix) + 1:].split('_')[0])
+
+    def _collect(self):
+        now = time()
+        pending = []
+        for path, keep, finished_at in self._pending:
+            if not os.path.exists(path):
+                if now - finished_at < self._grace_period:
+                    pending.append((path, keep, finished_at))
+            elif not keep:
+                os.remove(path)
+        self._pending = pending
+
+        if self._max_bytes is not None:
+            self._evict()
+
+    def _evict(self):
+        recordings = []
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            if name.startswith(self._prefix + '_') and name.endswith('.tgz') and os.path.isfile(path):
+                recordings.append((os.path.getmtime(path), os.path.getsize(path), path))
+
+        # Delete the oldest recordings first, keeping at least the latest one
+        recordings.sort()
+        total = sum(size for _, size, _ in recordings)
+        for _, size, path in recordings[:-1]:
+            if total <= self._max_bytes:
+                break
+            os.remove(path)
+            total -= size
@@ -0,0 +1,450 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+"""
+Stand-in for the parts of MalmoPython used by malmopy, simulating a small grid world without Minecraft.
+
+The simulation runs in real time at the mission's MsPerTick: ticks are computed from the wall clock
+whenever the world state is read, so no thread is needed. The agent walks on a flat square room, driven
+by the 'move' and 'turn' continuous movement commands, and finds the goal block to end the mission.
+Frames are rendered top-down at the resolution of the mission's video producers (VideoProducer, with or
+without depth, ColourMapProducer and LuminanceProducer).
+"""
+
+from __future__ import absolute_import
+
+import io
+import json
+import random
+import tarfile
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timedelta
+from math import cos, radians, sin
+from time import time
+
+import numpy as np
+
+MALMO_NAMESPACE = 'http://ProjectMalmo.microsoft.com'
+EPOCH = datetime(1970, 1, 1)
+
+# Cells of the rendered frames are walls, floor, goal or agent, and are drawn with these colors
+WALL, FLOOR, GOAL, AGENT = range(4)
+VIDEO_COLORS = np.array([(128, 128, 128), (34, 139, 34), (255, 215, 0), (200, 30, 30)], dtype=np.uint8)
+COLOUR_MAP_COLORS = np.array([(1, 0, 0), (2, 0, 0), (3, 0, 0), (0, 0, 1)], dtype=np.uint8)
+DEPTHS = np.array([(64,), (128,), (128,), (96,)], dtype=np.uint8)
+LUMINANCES = (VIDEO_COLORS.astype(np.uint32).dot((19595, 38470, 7471)) >> 16).astype(np.uint8)[:, np.newaxis]
+
+# Video producers supported, with the frame type of their frames
+PRODUCERS = (('VideoProducer', 'VIDEO'), ('ColourMapProducer', 'COLOUR_MAP'), ('LuminanceProducer', 'LUMINANCE'))
+
+
+def _tag(name):
+    return '{%s}%s' % (MALMO_NAMESPACE, name)
+
+
+def _timestamp(seconds):
+    # Malmo stamps world state items with naive UTC datetimes
+    return EPOCH + timedelta(seconds=seconds)
+
+
+class ClientInfo(object):
+    def __init__(self, ip_address='127.0.0.1', control_port=10000, command_port=0):
+        self.ip_address = ip_address
+        self.control_port = control_port
+        self.command_port = command_port
+
+
+class ClientPool(object):
+    def __init__(self):
+        self.clients = []
+
+    def add(self, client_info):
+        self.clients.append(client_info)
+
+
+class MissionSpec(object):
+    def __init__(self, xml=None, validate=False):
+        self.xml = xml
+        self._root = ElementTree.fromstring(xml) if xml is not None else None
+        self._force_reset = False
+        self._video = {}
+
+    def forceWorldReset(self):
+        self._force_reset = True
+
+    def isVideoRequested(self, role):
+        return role in self._video or self._producer(role) is not None
+
+    def requestVideo(self, width, height):
+        self._video[0] = (width, height)
+
+    def getAsXML(self, pretty_print=False):
+        return self.xml
+
+    def _agent_section(self, role):
+        sections = self._root.findall(_tag('AgentSection'))
+        return sections[role] if role < len(sections) else None
+
+    def _producer(self, role, producer='VideoProducer'):
+        section = self._agent_section(role)
+        if section is None:
+            return None
+        return section.find('%s/%s' % (_tag('AgentHandlers'), _tag(producer)))
+
+    def _find(self, path):
+        return self._root.find('/'.join(_tag(name) for name in path.split('/')))
+
+    def video_size(self, role):
+        if role in self._video:
+            return self._video[role]
+        producer = self._producer(role)
+        if producer is None:
+            return None
+        return int(producer.find(_tag('Width')).text), int(producer.find(_tag('Height')).text)
+
+    def video_palettes(self, role):
+        """
+        :return: List of (frame type, width, height, palette) of the video producers of an agent,
+        palette being the uint8 array of the pixel values of each cell kind
+        """
+        palettes = []
+        for producer, frame_type in PRODUCERS:
+            node = self._producer(role, producer)
+            if producer == 'VideoProducer':
+                if self.video_size(role) is None:
+                    continue
+                width, height = self.video_size(role)
+                want_depth = node is not None and node.get('want_depth', 'false').lower() in ('true', '1')
+                palette = np.hstack((VIDEO_COLORS, DEPTHS)) if want_depth else VIDEO_COLORS
+            elif node is None:
+                continue
+            else:
+                width, height = int(node.find(_tag('Width')).text), int(node.find(_tag('Height')).text)
+                palette = COLOUR_MAP_COLORS if frame_type == 'COLOUR_MAP' else LUMINANCES
+            palettes.append((frame_type, width, height, palette))
+        return palettes
+
+    def ms_per_tick(self):
+        node = self._find('ModSettings/MsPerTick')
+        return int(node.text) if node is not None and node.text else 50
+
+    def time_limit(self):
+        """
+        :return: Tuple (number of ticks, description), or None if the mission has no time limit
+        """
+        node = self._find('ServerSection/ServerHandlers/ServerQuitFromTimeUp')
+        if node is None:
+            return None
+        # Minecraft counts the time limit in game time, 50 ms per tick
+        return int(node.get('timeLimitMs')) // 50, node.get('description', 'out_of_time')
+
+    def goal_description(self, role):
+        section = self._agent_section(role)
+        node = section.find('%s/%s/%s' % (_tag('AgentHandlers'), _tag('AgentQuitFromTouchingBlockType'),
+                                          _tag('Block')))
+        return node.get('description', 'found_goal') if node is not None else 'found_goal'
+
+    def command_reward(self, role):
+        section = self._agent_section(role)
+        node = section.find('%s/%s' % (_tag('AgentHandlers'), _tag('RewardForSendingCommand')))
+        return float(node.get('reward', 0)) if node is not None else 0.
+
+    def end_rewards(self, role):
+        section = self._agent_section(role)
+        node = section.find('%s/%s' % (_tag('AgentHandlers'), _tag('RewardForMissionEnd')))
+        if node is None:
+            return {}
+        return dict((reward.get('description'), float(reward.get('reward'))) for reward in node)
+
+    def room_size(self):
+        node = self._find('ServerSection/ServerHandlers/ClassroomDecorator/specification/width')
+        return int(node.text) if node is not None else 7
+
+
+class MissionRecordSpec(object):
+    def __init__(self, destination=None):
+        self.destination = destination
+        self._what = set()
+
+    def recordCommands(self):
+        self._what.add('commands')
+
+    def recordMP4(self, frames_per_second, bit_rate):
+        self._what.add('mp4')
+
+    def recordRewards(self):
+        self._what.add('rewards')
+
+    def recordObservations(self):
+        self._what.add('observations')
+
+    def isRecording(self):
+        return self.destination is not None
+
+
+class TimestampedString(object):
+    def __init__(self, timestamp, text):
+        self.timestamp = timestamp
+        self.text = text
+
+
+class TimestampedReward(object):
+    def __init__(self, timestamp, value):
+        self.timestamp = timestamp
+        self._value = value
+
+    def getValue(self, dimension=0):
+        return self._value
+
+
+class TimestampedVideoFrame(object):
+    def __init__(self, timestamp, width, height, channels, pixels, frametype='VIDEO'):
+        self.timestamp = timestamp
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.pixels = pixels
+        self.frametype = frametype
+        self.xPos = self.yPos = self.zPos = self.yaw = self.pitch = 0.
+
+
+class WorldState(object):
+    def __init__(self):
+        self.has_mission_begun = False
+        self.is_mission_running = False
+        self.number_of_observations_since_last_state = 0
+        self.number_of_rewards_since_last_state = 0
+        self.number_of_video_frames_since_last_state = 0
+        self.observations = []
+        self.rewards = []
+        self.video_frames = []
+        self.mission_control_messages = []
+        self.errors = []
+
+
+class GridWorld(object):
+    """
+    Square room with a goal block, and an agent moving continuously within it
+    """
+
+    # Blocks per second at 'move 1', degrees per second at 'turn 1', for 20 ticks per second
+    WALK_SPEED = 4.317
+    TURN_SPEED = 180.
+
+    def __init__(self, size, rng):
+        self.size = size
+        spawn = (size // 2, size // 2)
+        self.goal = spawn
+        while self.goal == spawn and size > 1:
+            self.goal = (rng.randrange(size), rng.randrange(size))
+        self.respawn(rng)
+
+    def respawn(self, rng):
+        self.x = self.z = self.size / 2.
+        self.yaw = rng.uniform(0, 360)
+        self.move = self.turn = 0.
+        self.found_goal = False
+
+    def tick(self):
+        # Movement speeds are defined in game time, whatever MsPerTick is
+        self.yaw = (self.yaw + self.turn * self.TURN_SPEED / 20.) % 360
+        step = self.move * self.WALK_SPEED / 20.
+        self.x = min(max(self.x - sin(radians(self.yaw)) * step, 0.), self.size - 1e-3)
+        self.z = min(max(self.z + cos(radians(self.yaw)) * step, 0.), self.size - 1e-3)
+        self.found_goal = (int(self.x), int(self.z)) == self.goal
+
+    def render(self, width, height, palette):
+        """
+        :param palette: uint8 array of the pixel values of each cell kind, of shape (4, channels)
+        :return: uint8 array of shape (height, width, channels)
+        """
+        cells = self.size + 2
+        kinds = np.full((cells, cells), WALL, dtype=np.uint8)
+        kinds[1:-1, 1:-1] = FLOOR
+        kinds[self.goal[1] + 1, self.goal[0] + 1] = GOAL
+        kinds[int(self.z) + 1, int(self.x) + 1] = AGENT
+
+        # Nearest neighbour upscaling to the requested resolution
+        rows = np.arange(height) * cells // height
+        columns = np.arange(width) * cells // width
+        return palette[kinds[rows[:, np.newaxis], columns]]
+
+
+class AgentHost(object):
+    """
+    Simulated agent host. Only the world state policies used by malmopy are supported:
+    latest observation only, latest frame only and summed rewards.
+    Each agent host simulates its own world, so multi-agent and turn based missions are not supported.
+    """
+
+    # Seconds between the mission start request and the beginning of the mission
+    START_DELAY = .1
+
+    def __init__(self, seed=None):
+        """
+        :param seed: Seed of the world generation, None for a random seed
+        """
+        self._rng = random.Random(seed)
+        self._spec = None
+        self._world = None
+        self._role = 0
+        self._recording = None
+        self._began_at = None
+        self._tick_duration = .05
+        self._time_limit = None
+        self._ticks = 0
+        self._ended = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._observations = 0
+        self._reward = 0.
+        self._rewarded = False
+        self._pending_reward = 0.
+        self._messages = []
+
+    def startMission(self, mission, client_pool, record_spec=None, role=0, exp_id=''):
+        if self._began_at is not None and self._ended is None:
+            raise RuntimeError('A mission is already running')
+        if client_pool is not None and len(client_pool.clients) == 0:
+            raise RuntimeError('No client available')
+
+        # As with Minecraft, the world is kept between missions unless a reset is forced
+        size = mission.room_size()
+        if mission._force_reset or self._world is None or self._world.size != size:
+            self._world = GridWorld(size, self._rng)
+        else:
+            self._world.respawn(self._rng)
+        self._spec = mission
+        self._role = role
+        self._palettes = mission.video_palettes(role)
+        self._recording = record_spec if record_spec is not None and record_spec.isRecording() else None
+        self._tick_duration = mission.ms_per_tick() / 1000.
+        self._time_limit = mission.time_limit()
+        self._goal_description = mission.goal_description(role)
+        self._end_rewards = mission.end_rewards(role)
+        self._command_reward = mission.command_reward(role)
+        self._began_at = time() + self.START_DELAY
+        self._ticks = 0
+        self._ended = None
+        self._rewards_log = []
+        self._reset_state()
+
+    def _advance(self):
+        if self._began_at is None or self._ended is not None:
+            return
+
+        ticks = int((time() - self._began_at) / self._tick_duration)
+        while self._ticks < ticks and self._ended is None:
+            self._ticks += 1
+            self._world.tick()
+            self._observations += 1
+
+            reward = self._pending_reward
+            self._pending_reward = 0.
+            if self._world.found_goal:
+                self._end(self._goal_description)
+            elif self._time_limit is not None and self._ticks >= self._time_limit[0]:
+                self._end(self._time_limit[1])
+            if self._ended is not None:
+                reward += self._end_rewards.get(self._ended, 0.)
+
+            if reward != 0:
+                self._reward += reward
+                self._rewarded = True
+                self._rewards_log.append((self._ticks, reward))
+
+    def _end(self, description):
+        self._ended = description
+        ended_at = self._tick_time(self._ticks)
+        self._messages.append(TimestampedString(
+            ended_at, '<MissionEnded xmlns="%s"><Status>ENDED</Status><HumanReadableStatus>%s</HumanReadableStatus>'
+                      '</MissionEnded>' % (MALMO_NAMESPACE, description)))
+        if self._recording is not None:
+            self._write_recording()
+
+    def _write_recording(self):
+        with tarfile.open(self._recording.destination, 'w:gz') as archive:
+            for name, text in (('mission.xml', self._spec.xml),
+                               ('rewards.txt', '\n'.join('%d:%g' % entry for entry in self._rewards_log))):
+                data = text.encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+    def _tick_time(self, tick):
+        return _timestamp(self._began_at + tick * self._tick_duration)
+
+    def _world_state(self, consume):
+        self._advance()
+
+        state = WorldState()
+        if self._began_at is None or time() < self._began_at:
+            return state
+
+        state.has_mission_begun = True
+        state.is_mission_running = self._ended is None
+        state.number_of_observations_since_last_state = self._observations
+        state.mission_control_messages = list(self._messages)
+
+        if self._observations > 0:
+            timestamp = self._tick_time(self._ticks)
+            world = self._world
+            state.observations = [TimestampedString(timestamp, json.dumps(
+                {'XPos': world.x, 'YPos': 0., 'ZPos': world.z, 'Yaw': world.yaw, 'Pitch': 0., 'Life': 20.,
+                 'TimeAlive': self._ticks}))]
+            for frame_type, width, height, palette in self._palettes:
+                pixels = world.render(width, height, palette)
+                state.video_frames.append(TimestampedVideoFrame(timestamp, width, height, palette.shape[1],
+                                                                pixels.tobytes(), frame_type))
+            state.number_of_video_frames_since_last_state = len(state.video_frames)
+        if self._rewarded:
+            state.rewards = [TimestampedReward(self._tick_time(self._ticks), self._reward)]
+            state.number_of_rewards_since_last_state = 1
+
+        if consume:
+            self._reset_state()
+        return state
+
+    def peekWorldState(self):
+        return self._world_state(False)
+
+    def getWorldState(self):
+        return self._world_state(True)
+
+    def sendCommand(self, command, key=None):
+        if self._began_at is None or self._ended is not None:
+            return
+
+        self._advance()
+        verb, _, value = command.partition(' ')
+        if verb == 'move':
+            self._world.move = min(max(float(value), -1.), 1.)
+        elif verb == 'turn':
+            self._world.turn = min(max(float(value), -1.), 1.)
+        elif verb == 'quit':
+            self._end('quit')
+        self._pending_reward += self._command_reward
+
+    def setObservationsPolicy(self, policy):
+        pass
+
+    def setVideoPolicy(self, policy):
+        pass
+
+    def setRewardsPolicy(self, policy):
+        pass
@@ -0,0 +1,275 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+from multiprocessing import Pipe, Process
+from multiprocessing.sharedctypes import RawArray
+from traceback import format_exc
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8, states are shared through a RawArray inherited by the workers
+    shared_memory = None
+
+
+def _attach(buffer, shape, dtype):
+    """
+    Map the shared states buffer as a numpy array
+    :return: Tuple (array, handle to keep alive while the array is in use)
+    """
+    if shared_memory is not None:
+        handle = shared_memory.SharedMemory(name=buffer)
+        return np.ndarray(shape, dtype=dtype, buffer=handle.buf), handle
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape), buffer
+
+
+def _worker(index, factory, pipe, buffer, shape, dtype):
+    states, handle = _attach(buffer, shape, dtype)
+    env = None
+
+    try:
+        env = factory()
+        while True:
+            command, data = pipe.recv()
+
+            if command == 'reset':
+                env.reset()
+                states[index] = env.state
+                pipe.send(('ok', None))
+            elif command == 'step':
+                _, reward, done, info = env.step(data)
+                if done:
+                    env.reset()
+                states[index] = env.state
+                pipe.send(('ok', (reward, done, info)))
+            elif command == 'close':
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        try:
+            pipe.send(('error', format_exc()))
+        except (IOError, OSError):
+            pass
+    finally:
+        if env is not None:
+            env.close()
+        del states
+        if shared_memory is not None:
+            handle.close()
+        pipe.close()
+
+
+class MalmoSubprocVecEnvironment(object):
+    """
+    Run N mission environments in their own worker process, each with its own AgentHost.
+
+    Workers write the states they build directly into a shared memory array indexed by worker,
+    only actions, rewards and dones go through pipes. Environments reaching the end of their mission
+    are reset automatically: their dones entry is True and their states entry holds the first state
+    of the next mission.
+
+    A worker which crashes (e.g. because its Minecraft client died) is restarted from its factory,
+    up to max_restarts times. Meanwhile its environment reports done=True, a reward of 0 and a zero state,
+    with 'crashed' set in its info dictionary, and 'error' holding the worker's traceback (if it sent one).
+    Crashes are also printed, as a deterministic error otherwise silently uses up all the restarts.
+    """
+
+    def __init__(self, factories, state_shape, state_dtype=np.uint8, max_restarts=3, timeout=None):
+        """
+        :param factories: Sequence of picklable callables, each returning a new MissionEnvironment
+        :param state_shape: Shape of the states built by the environments
+        :param state_dtype: Type of the states built by the environments
+        :param max_restarts: Number of times a crashed worker is restarted before giving up on it
+        :param timeout: Number of seconds to wait for a worker's reply before considering it crashed
+                        (None waits forever)
+        """
+        assert factories is not None and len(factories) > 0, 'at least 1 factory should be provided'
+        assert max_restarts >= 0, 'max_restarts should be >= 0'
+
+        self._factories = list(factories)
+        self._shape = (len(self._factories),) + tuple(state_shape)
+        self._dtype = np.dtype(state_dtype)
+        self._max_restarts = max_restarts
+        self._timeout = timeout
+
+        nbytes = int(np.prod(self._shape)) * self._dtype.itemsize
+        if shared_memory is not None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._buffer = self._shm.name
+            self._states = np.ndarray(self._shape, dtype=self._dtype, buffer=self._shm.buf)
+        else:
+            self._shm = None
+            self._buffer = RawArray('B', nbytes)
+            self._states = np.frombuffer(self._buffer, dtype=self._dtype).reshape(self._shape)
+        self._states.fill(0)
+
+        self._rewards = np.zeros(len(self._factories), dtype=np.float32)
+        self._dones = np.zeros(len(self._factories), dtype=bool)
+        self._restarts = [0] * len(self._factories)
+        self._workers = [None] * len(self._factories)
+        self._pipes = [None] * len(self._factories)
+        self._closed = False
+
+        for idx in range(len(self._factories)):
+            self._start_worker(idx)
+
+    def __len__(self):
+        return len(self._factories)
+
+    @property
+    def num_envs(self):
+        return len(self._factories)
+
+    @property
+    def restarts(self):
+        """
+        Number of times each worker was restarted after a crash
+        """
+        return list(self._restarts)
+
+    def _start_worker(self, idx):
+        parent, child = Pipe()
+        worker = Process(target=_worker, args=(idx, self._factories[idx], child, self._buffer,
+                                               self._shape, self._dtype))
+        worker.daemon = True
+        worker.start()
+        child.close()
+
+        self._workers[idx] = worker
+        self._pipes[idx] = parent
+
+    def _stop_worker(self, idx):
+        if self._pipes[idx] is not None:
+            self._pipes[idx].close()
+            self._pipes[idx] = None
+        if self._workers[idx] is not None:
+            if self._workers[idx].is_alive():
+                self._workers[idx].terminate()
+            self._workers[idx].join()
+            self._workers[idx] = None
+
+    def _send(self, idx, command, data=None):
+        if self._pipes[idx] is None:
+            return False
+        try:
+            self._pipes[idx].send((command, data))
+            return True
+        except (IOError, OSError):
+            return False
+
+    def _receive(self, idx):
+        """
+        :return: Tuple (success, payload), payload being the error message on failure
+        """
+        pipe = self._pipes[idx]
+        if pipe is None:
+            return False, 'worker is not running'
+        try:
+            if self._timeout is not None and not pipe.poll(self._timeout):
+                return False, 'no reply after %s seconds' % self._timeout
+            status, payload = pipe.recv()
+        except (EOFError, IOError, OSError):
+            return False, 'worker exited'
+        return status == 'ok', payload
+
+    def _recover(self, idx, error):
+        """
+        Replace a crashed worker with a new one and start a new mission on it
+        :param error: Message describing the crash
+        """
+        # Workers given up on are not reported again at each step
+        crashed = self._workers[idx] is not None
+        if crashed:
+            print('Worker %d crashed: %s' % (idx, error))
+        self._stop_worker(idx)
+        self._states[idx] = 0
+
+        while self._restarts[idx] < self._max_restarts:
+            self._restarts[idx] += 1
+            self._start_worker(idx)
+            if self._send(idx, 'reset'):
+                success, error = self._receive(idx)
+                if success:
+                    return
+            else:
+                error = 'worker is not running'
+            print('Worker %d failed to restart (%d/%d): %s' % (idx, self._restarts[idx], self._max_restarts, error))
+            self._stop_worker(idx)
+            self._states[idx] = 0
+
+        if crashed:
+            print('Giving up on worker %d after %d restarts' % (idx, self._restarts[idx]))
+
+    def reset(self):
+        """
+        Start a new mission on all the environments
+        :return: Array of shape (N,) + state shape
+        """
+        sent = [self._send(idx, 'reset') for idx in range(len(self._factories))]
+        for idx in range(len(self._factories)):
+            success, payload = self._receive(idx) if sent[idx] else (False, 'worker is not running')
+            if not success:
+                self._recover(idx, payload)
+
+        self._dones.fill(False)
+        return self._states
+
+    def step(self, actions):
+        """
+        Do one action in each environment
+        :param actions: Sequence of N actions, in the same order as the environments
+        :return: Tuple (states[N, ...], rewards[N], dones[N], infos)
+        """
+        assert len(actions) == len(self._factories), \
+            'expected %d actions (got %d)' % (len(self._factories), len(actions))
+
+        sent = [self._send(idx, 'step', action) for idx, action in enumerate(actions)]
+
+        infos = []
+        for idx in range(len(self._factories)):
+            success, payload = self._receive(idx) if sent[idx] else (False, 'worker is not running')
+
+            if success:
+                self._rewards[idx], self._dones[idx], info = payload
+            else:
+                self._rewards[idx], self._dones[idx], info = 0., True, {'crashed': True, 'error': payload}
+                self._recover(idx, payload)
+            infos.append(info)
+
+        return self._states, self._rewards, self._dones, infos
+
+    def close(self):
+        if self._closed:
+            return
+
+        for idx in range(len(self._factories)):
+            self._send(idx, 'close')
+        for idx in range(len(self._factories)):
+            if self._workers[idx] is not None:
+                self._workers[idx].join(1)
+            self._stop_worker(idx)
+
+        if self._shm is not None:
+            del self._states
+            self._shm.close()
+            self._shm.unlink()
+        self._closed = True
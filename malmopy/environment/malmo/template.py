@@ -0,0 +1,261 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import random
+import xml.etree.ElementTree as ElementTree
+
+from .backend import MissionSpec
+
+MALMO_NAMESPACE = 'http://ProjectMalmo.microsoft.com'
+XSI_NAMESPACE = 'http://www.w3.org/2001/XMLSchema-instance'
+
+# Serialize the patched documents with the same prefixes as the hand written missions
+ElementTree.register_namespace('', MALMO_NAMESPACE)
+ElementTree.register_namespace('xsi', XSI_NAMESPACE)
+
+
+def _tag(name):
+    return '{%s}%s' % (MALMO_NAMESPACE, name)
+
+
+def _path(*names):
+    return '/'.join(_tag(name) for name in names)
+
+
+class MissionTemplate(object):
+    """
+    Mission XML parsed and validated once, producing a MissionSpec for each episode.
+
+    The parameters which change between episodes (tick duration, seed, agent placements, drawn items and
+    entities) are patched directly in the parsed document. MissionSpecs are then built from the patched
+    document without validating it again.
+
+    An optional randomizer is called before each episode with the template and a random.Random,
+    seeded from the template's seed and the episode index. Each role of a multi-agent mission
+    hence draws the same mission for the same episode.
+
+    Templates are picklable, so they can be built once in the parent process and handed to the role processes.
+    """
+
+    def __init__(self, mission_xml, randomizer=None, seed=None):
+        """
+        :param mission_xml: Mission XML description
+        :param randomizer: Optional callable(template, rng) patching the template before each episode
+        :param seed: Seed of the randomizer (drawn at random if None)
+        """
+        assert mission_xml is not None, 'mission_xml cannot be None'
+        assert randomizer is None or callable(randomizer), 'randomizer should be callable'
+
+        # Validation against Malmo's schemas is the expensive part, do it once for all episodes
+        MissionSpec(mission_xml, True)
+
+        self._randomizer = randomizer
+        self._seed = seed if seed is not None else random.randint(0, 2 ** 31 - 1)
+        self._episodes = 0
+        self._parse(mission_xml)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_root'] = self.to_xml()
+        for key in ('_ms_per_tick', '_agent_sections', '_drawing'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        mission_xml = state.pop('_root')
+        self.__dict__.update(state)
+        self._parse(mission_xml)
+
+    def _parse(self, mission_xml):
+        self._root = ElementTree.fromstring(mission_xml)
+
+        # Index the patchable nodes once
+        self._ms_per_tick = self._root.find(_path('ModSettings', 'MsPerTick'))
+        self._agent_sections = self._root.findall(_tag('AgentSection'))
+        self._drawing = self._root.find(_path('ServerSection', 'ServerHandlers', 'DrawingDecorator'))
+
+    @property
+    def episodes(self):
+        """
+        Number of MissionSpecs created so far
+        """
+        return self._episodes
+
+    @property
+    def seed(self):
+        return self._seed
+
+    @seed.setter
+    def seed(self, value):
+        self._seed = int(value)
+
+    @property
+    def ms_per_tick(self):
+        """
+        Duration of a Minecraft tick in milliseconds, or None if the mission uses Minecraft's default
+        """
+        if self._ms_per_tick is None or not self._ms_per_tick.text:
+            return None
+        return int(self._ms_per_tick.text.strip())
+
+    @ms_per_tick.setter
+    def ms_per_tick(self, value):
+        assert value > 0, 'ms_per_tick should be > 0'
+
+        if self._ms_per_tick is None:
+            mod_settings = self._root.find(_tag('ModSettings'))
+            if mod_settings is None:
+                # ModSettings comes right after About
+                mod_settings = ElementTree.Element(_tag('ModSettings'))
+                self._root.insert(1, mod_settings)
+            self._ms_per_tick = ElementTree.SubElement(mod_settings, _tag('MsPerTick'))
+        self._ms_per_tick.text = str(int(value))
+
+    @property
+    def agent_count(self):
+        return len(self._agent_sections)
+
+    def _placement(self, role):
+        assert 0 <= role < len(self._agent_sections), 'role should be in [0, %d[' % len(self._agent_sections)
+
+        placement = self._agent_sections[role].find(_path('AgentStart', 'Placement'))
+        assert placement is not None, 'agent section %d has no Placement' % role
+        return placement
+
+    def placement(self, role):
+        """
+        :return: Tuple (x, y, z, yaw, pitch) of the agent's start position, yaw and pitch default to 0
+        """
+        placement = self._placement(role)
+        return tuple(float(placement.get(key, 0)) for key in ('x', 'y', 'z', 'yaw', 'pitch'))
+
+    def set_placement(self, role, x, y, z, yaw=None, pitch=None):
+        """
+        Move the start position of an agent
+        :param role: Index of the agent section
+        """
+        placement = self._placement(role)
+        for key, value in (('x', x), ('y', y), ('z', z), ('yaw', yaw), ('pitch', pitch)):
+            if value is not None:
+                placement.set(key, str(value))
+
+    def _video_producer(self, role, producer='VideoProducer'):
+        assert 0 <= role < len(self._agent_sections), 'role should be in [0, %d[' % len(self._agent_sections)
+        return self._agent_sections[role].find(_path('AgentHandlers', producer))
+
+    def video_size(self, role):
+        """
+        :return: Tuple (width, height) of the frames rendered for an agent, or None if it has no VideoProducer
+        """
+        return self.producer_size(role, 'VideoProducer')
+
+    def producer_size(self, role, producer):
+        """
+        :param producer: Name of the video producer element, e.g. 'ColourMapProducer'
+        :return: Tuple (width, height) of the frames of this producer, or None if the agent has no such producer
+        """
+        node = self._video_producer(role, producer)
+        if node is None:
+            return None
+        return int(node.find(_tag('Width')).text), int(node.find(_tag('Height')).text)
+
+    def set_producer_size(self, role, producer, width, height):
+        """
+        Change the resolution of the frames of a video producer, adding the producer if the agent has none
+        :param role: Index of the agent section
+        :param producer: Name of the video producer element, e.g. 'ColourMapProducer'
+        """
+        assert width > 0, 'width should be > 0'
+        assert height > 0, 'height should be > 0'
+
+        node = self._video_producer(role, producer)
+        if node is None:
+            handlers = self._agent_sections[role].find(_tag('AgentHandlers'))
+            node = ElementTree.SubElement(handlers, _tag(producer))
+            ElementTree.SubElement(node, _tag('Width'))
+            ElementTree.SubElement(node, _tag('Height'))
+
+        node.find(_tag('Width')).text = str(int(width))
+        node.find(_tag('Height')).text = str(int(height))
+
+    def video_depth(self, role):
+        """
+        :return: True if the frames rendered for an agent hold a depth channel
+        """
+        producer = self._video_producer(role)
+        return producer is not None and producer.get('want_depth', 'false').lower() in ('true', '1')
+
+    def set_video_size(self, role, width, height, want_depth=None):
+        """
+        Change the resolution of the frames rendered for an agent
+        :param role: Index of the agent section
+        :param want_depth: Request (True) or drop (False) the depth channel, None leaves it unchanged
+        """
+        assert width > 0, 'width should be > 0'
+        assert height > 0, 'height should be > 0'
+
+        producer = self._video_producer(role)
+        assert producer is not None, 'agent section %d has no VideoProducer' % role
+
+        self.set_producer_size(role, 'VideoProducer', width, height)
+        if want_depth is not None:
+            producer.set('want_depth', 'true' if want_depth else 'false')
+
+    def _draw(self, tag, objects):
+        assert self._drawing is not None, 'mission has no DrawingDecorator'
+
+        for node in self._drawing.findall(_tag(tag)):
+            self._drawing.remove(node)
+        for x, y, z, object_type in objects:
+            ElementTree.SubElement(self._drawing, _tag(tag), x=str(x), y=str(y), z=str(z), type=object_type)
+
+    def draw_items(self, items):
+        """
+        Replace the items drawn by the DrawingDecorator
+        :param items: Sequence of (x, y, z, type)
+        """
+        self._draw('DrawItem', items)
+
+    def draw_entities(self, entities):
+        """
+        Replace the entities drawn by the DrawingDecorator
+        :param entities: Sequence of (x, y, z, type)
+        """
+        self._draw('DrawEntity', entities)
+
+    def to_xml(self):
+        """
+        :return: Current mission XML, including the patched parameters
+        """
+        return ElementTree.tostring(self._root).decode('utf-8')
+
+    def create_mission_spec(self, episode=None):
+        """
+        Randomize the parameters of the episode if a randomizer was provided, then build its MissionSpec
+        :param episode: Index of the episode, defaults to the number of MissionSpecs created so far
+        :return: MissionSpec, not validated again
+        """
+        if episode is None:
+            episode = self._episodes
+
+        if self._randomizer is not None:
+            self._randomizer(self, random.Random(self._seed + episode))
+        self._episodes += 1
+
+        return MissionSpec(self.to_xml(), False)
@@ -0,0 +1,106 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import numpy as np
+
+from .wait import sleep_through_all
+
+
+class MalmoVecEnvironment(object):
+    """
+    Step N mission environments in lockstep and return batched states.
+
+    Each environment wraps its own Malmo client (or role). Actions are sent to all the environments
+    before waiting, and the waits are interleaved in the calling thread, so a step lasts as long as
+    the slowest environment rather than the sum of all of them.
+
+    Environments reaching the end of their mission are reset automatically during the same step:
+    their dones entry is True and their states entry holds the first state of the next mission.
+    The states, rewards and dones arrays are preallocated and reused by every call.
+    """
+
+    def __init__(self, environments):
+        """
+        :param environments: Sequence of MissionEnvironment instances
+        """
+        assert environments is not None and len(environments) > 0, 'at least 1 environment should be provided'
+        assert all(hasattr(env, 'iter_step') for env in environments), \
+            'environments should inherit from MissionEnvironment'
+
+        self._envs = list(environments)
+        self._states = None
+        self._rewards = np.zeros(len(self._envs), dtype=np.float32)
+        self._dones = np.zeros(len(self._envs), dtype=bool)
+
+    def __len__(self):
+        return len(self._envs)
+
+    @property
+    def num_envs(self):
+        return len(self._envs)
+
+    @property
+    def environments(self):
+        return self._envs
+
+    @property
+    def available_actions(self):
+        return self._envs[0].available_actions
+
+    def reset(self):
+        """
+        Start a new mission on all the environments
+        :return: Array of shape (N,) + state shape
+        """
+        sleep_through_all([env.iter_reset() for env in self._envs])
+
+        self._dones.fill(False)
+        for idx, env in enumerate(self._envs):
+            self._store_state(idx, env.state)
+        return self._states
+
+    def step(self, actions):
+        """
+        Do one action in each environment
+        :param actions: Sequence of N actions, in the same order as the environments
+        :return: Tuple (states[N, ...], rewards[N], dones[N], infos)
+        """
+        assert len(actions) == len(self._envs), \
+            'expected %d actions (got %d)' % (len(self._envs), len(actions))
+
+        sleep_through_all([env.iter_step(action) for env, action in zip(self._envs, actions)])
+
+        for idx, env in enumerate(self._envs):
+            self._rewards[idx] = env.reward
+            self._dones[idx] = env.done
+
+        finished = np.flatnonzero(self._dones)
+        if len(finished) > 0:
+            sleep_through_all([self._envs[idx].iter_reset() for idx in finished])
+
+        for idx, env in enumerate(self._envs):
+            self._store_state(idx, env.state)
+
+        return self._states, self._rewards, self._dones, [{} for _ in self._envs]
+
+    def _store_state(self, idx, state):
+        state = np.asarray(state)
+        if self._states is None:
+            self._states = np.zeros((len(self._envs),) + state.shape, dtype=state.dtype)
+        self._states[idx] = state
@@ -0,0 +1,119 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import json
+
+import numpy as np
+
+
+class Vocabulary(object):
+    """
+    Persistent mapping between Minecraft names (blocks, entities, items) and small integer ids.
+
+    Ids are assigned in order of first appearance and never change, so arrays decoded with the
+    same vocabulary stay comparable across episodes and runs (see #save() and #load()).
+    Id 0 is reserved for names which could not be registered because the vocabulary is full.
+    """
+
+    UNKNOWN = '<unknown>'
+    UNKNOWN_ID = 0
+
+    def __init__(self, names=None, max_size=128):
+        """
+        :param names: Optional sequence of names to register upfront
+        :param max_size: Maximum number of ids, including the reserved unknown id
+        """
+        assert max_size > 1, 'max_size should be > 1'
+
+        self._max_size = int(max_size)
+        self._ids = {Vocabulary.UNKNOWN: Vocabulary.UNKNOWN_ID}
+        self._names = [Vocabulary.UNKNOWN]
+
+        if names is not None:
+            for name in names:
+                self.id(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def dtype(self):
+        """
+        Smallest signed integer type able to hold all the ids of this vocabulary
+        """
+        return np.int8 if self._max_size <= 128 else np.int16
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    def id(self, name):
+        """
+        Return the id of the specified name, registering it if needed
+        :param name: Name to look up
+        :return: Integer id, UNKNOWN_ID if the vocabulary is full
+        """
+        name_id = self._ids.get(name, None)
+        if name_id is None:
+            if len(self._names) >= self._max_size:
+                return Vocabulary.UNKNOWN_ID
+            name_id = len(self._names)
+            self._ids[name] = name_id
+            self._names.append(name)
+        return name_id
+
+    def name(self, name_id):
+        return self._names[name_id]
+
+    def ids(self, names, out=None):
+        """
+        Map a sequence of names to their ids.
+        Each distinct name is looked up only once, whatever the length of the sequence.
+        :param names: Sequence of names
+        :param out: Optional 1D integer array receiving the ids
+        :return: 1D integer array of ids
+        """
+        unique, first, inverse = np.unique(np.asarray(names), return_index=True, return_inverse=True)
+
+        # np.unique sorts the names, new ones are registered in order of first appearance instead
+        lut = np.empty(len(unique), dtype=self.dtype)
+        for index in np.argsort(first, kind='stable'):
+            lut[index] = self.id(unique[index].item())
+
+        if out is None:
+            out = np.empty(len(inverse), dtype=self.dtype)
+        np.take(lut, inverse.ravel(), out=out)
+        return out
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'max_size': self._max_size, 'names': self._names[1:]}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            content = json.load(f)
+        return cls(content['names'], max_size=content['max_size'])
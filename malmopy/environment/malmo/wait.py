@@ -0,0 +1,317 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+from time import sleep, time
+
+
+def sleep_through(delays):
+    """
+    Run a generator of wait delays to completion, sleeping the calling thread for each delay.
+    This is the blocking counterpart of the iter_* methods of MalmoEnvironment.
+    :param delays: Iterable of delays in seconds
+    """
+    for delay in delays:
+        if delay > 0:
+            sleep(delay)
+
+
+def sleep_through_all(generators):
+    """
+    Run several generators of wait delays concurrently in the calling thread.
+    Each generator is resumed once its own delay has elapsed, the thread sleeps until the earliest one is due.
+    :param generators: Iterable of generators yielding delays in seconds
+    """
+    pending = [[generator, 0.] for generator in generators]
+
+    while len(pending) > 0:
+        now = time()
+        for entry in list(pending):
+            if entry[1] <= now:
+                try:
+                    entry[1] = now + next(entry[0])
+                except StopIteration:
+                    pending.remove(entry)
+
+        if len(pending) > 0:
+            delay = min(entry[1] for entry in pending) - time()
+            if delay > 0:
+                sleep(delay)
+
+
+class WaitTimeoutError(Exception):
+    """
+    Raised when a wait strategy gives up waiting for the next world state.
+    """
+
+    def __init__(self, timeout, polls):
+        super(WaitTimeoutError, self).__init__(
+            'No valid world state received after %.2fs (%d polls)' % (timeout, polls))
+        self.timeout = timeout
+        self.polls = polls
+
+
+class MissionStalledError(Exception):
+    """
+    Raised when the client stops sending observations while a mission is running.
+    """
+
+    def __init__(self, elapsed, observations):
+        super(MissionStalledError, self).__init__(
+            'No new observation received for %.2fs (%d observations before)' % (elapsed, observations))
+        self.elapsed = elapsed
+        self.observations = observations
+
+
+class WaitStatistics(object):
+    """
+    Counters describing how many times the agent host was polled while waiting.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._waits = 0
+        self._total_polls = 0
+        self._total_time = 0.
+        self._last_polls = 0
+        self._last_time = 0.
+
+    def record(self, polls, elapsed):
+        self._waits += 1
+        self._total_polls += polls
+        self._total_time += elapsed
+        self._last_polls = polls
+        self._last_time = elapsed
+
+    @property
+    def waits(self):
+        return self._waits
+
+    @property
+    def last_polls(self):
+        return self._last_polls
+
+    @property
+    def last_time(self):
+        return self._last_time
+
+    @property
+    def total_polls(self):
+        return self._total_polls
+
+    @property
+    def total_time(self):
+        return self._total_time
+
+    @property
+    def mean_polls(self):
+        return self._total_polls / float(self._waits) if self._waits > 0 else 0.
+
+    @property
+    def mean_time(self):
+        return self._total_time / float(self._waits) if self._waits > 0 else 0.
+
+
+class ResetStatistics(object):
+    """
+    Duration of each phase of the mission resets.
+
+    Phases are:
+     - start_request: until startMission() was accepted, including retries
+     - mission_begun: until the world state reports that the mission has begun
+     - first_observation: until the first valid world state is received
+    """
+
+    PHASES = ('start_request', 'mission_begun', 'first_observation')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._resets = 0
+        self._last = dict((phase, 0.) for phase in ResetStatistics.PHASES)
+        self._total = dict((phase, 0.) for phase in ResetStatistics.PHASES)
+
+    def record(self, start_request, mission_begun, first_observation):
+        self._resets += 1
+        for phase, elapsed in zip(ResetStatistics.PHASES, (start_request, mission_begun, first_observation)):
+            self._last[phase] = elapsed
+            self._total[phase] += elapsed
+
+    @property
+    def resets(self):
+        return self._resets
+
+    @property
+    def last(self):
+        """
+        Phase durations of the last reset, in seconds
+        """
+        return dict(self._last)
+
+    @property
+    def mean(self):
+        """
+        Mean phase durations over all the resets, in seconds
+        """
+        return dict((phase, total / self._resets if self._resets > 0 else 0.)
+                    for phase, total in self._total.items())
+
+    @property
+    def last_time(self):
+        return sum(self._last.values())
+
+    @property
+    def total_time(self):
+        return sum(self._total.values())
+
+
+class WaitStrategy(object):
+    """
+    Decide how long to pause between two polls of the agent host.
+
+    A wait starts with #start(), then #next_delay() is asked for the pause before each poll
+    and #stop() closes the wait once a valid world state was received.
+    Subclasses should override #_delay().
+    """
+
+    def __init__(self, timeout=None):
+        """
+        :param timeout: Default number of seconds after which a wait raises WaitTimeoutError (None waits forever)
+        """
+        assert timeout is None or timeout > 0, 'timeout should be > 0'
+
+        self._timeout = timeout
+        self._wait_timeout = timeout
+        self._stats = WaitStatistics()
+        self._started_at = None
+        self._polls = 0
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def statistics(self):
+        return self._stats
+
+    def start(self, timeout=None):
+        """
+        Begin a new wait
+        :param timeout: Override the default timeout for this wait only
+        """
+        self._wait_timeout = timeout if timeout is not None else self._timeout
+        self._started_at = time()
+        self._polls = 0
+
+    def next_delay(self):
+        """
+        Return the number of seconds to pause before the next poll
+        :return: Float >= 0, 0 meaning poll again immediately
+        """
+        self._polls += 1
+        elapsed = time() - self._started_at
+
+        if self._wait_timeout is not None and elapsed > self._wait_timeout:
+            self.stop()
+            raise WaitTimeoutError(elapsed, self._polls)
+
+        return self._delay(self._polls, elapsed)
+
+    def wait(self):
+        """
+        Pause the calling thread before the next poll
+        """
+        delay = self.next_delay()
+        if delay > 0:
+            sleep(delay)
+
+    def tune(self, ms_per_tick):
+        """
+        Adapt the delays to a new tick duration, e.g. once the mission's MsPerTick was calibrated.
+        Does nothing by default
+        :param ms_per_tick: Duration of a Minecraft tick in milliseconds
+        """
+        pass
+
+    def stop(self):
+        """
+        End the current wait and record its statistics
+        """
+        if self._started_at is not None:
+            self._stats.record(self._polls, time() - self._started_at)
+            self._started_at = None
+
+    def _delay(self, polls, elapsed):
+        raise NotImplementedError()
+
+
+class SpinWaitStrategy(WaitStrategy):
+    """
+    Poll again immediately. Lowest latency, but keeps one core busy while waiting.
+    """
+
+    def _delay(self, polls, elapsed):
+        return 0.
+
+
+class BackoffWaitStrategy(WaitStrategy):
+    """
+    Spin for a few polls, then sleep with an exponentially increasing delay.
+
+    The delays are derived from the mission's MsPerTick so that a new tick is never
+    missed by more than a fraction of the tick duration.
+    """
+
+    def __init__(self, ms_per_tick=50, spin_polls=10, min_delay=.0005, max_tick_fraction=.25, timeout=None):
+        """
+        :param ms_per_tick: Duration of a Minecraft tick in milliseconds
+        :param spin_polls: Number of polls done without sleeping at the beginning of each wait
+        :param min_delay: First sleep delay in seconds
+        :param max_tick_fraction: Upper bound of the sleep delay, as a fraction of a tick
+        :param timeout: Default number of seconds after which a wait raises WaitTimeoutError (None waits forever)
+        """
+        assert ms_per_tick > 0, 'ms_per_tick should be > 0'
+        assert spin_polls >= 0, 'spin_polls should be >= 0'
+        assert min_delay > 0, 'min_delay should be > 0'
+        assert 0 < max_tick_fraction <= 1, 'max_tick_fraction should be in ]0, 1]'
+
+        super(BackoffWaitStrategy, self).__init__(timeout)
+
+        self._spin_polls = int(spin_polls)
+        self._min_delay = min_delay
+        self._max_tick_fraction = max_tick_fraction
+        self.tune(ms_per_tick)
+
+    @property
+    def max_delay(self):
+        return self._max_delay
+
+    def tune(self, ms_per_tick):
+        assert ms_per_tick > 0, 'ms_per_tick should be > 0'
+        self._max_delay = max(self._min_delay, ms_per_tick / 1000. * self._max_tick_fraction)
+
+    def _delay(self, polls, elapsed):
+        if polls <= self._spin_polls:
+            return 0.
+
+        # Exponent is bounded to avoid overflowing on very long waits
+        exponent = min(polls - self._spin_polls - 1, 32)
+        return min(self._min_delay * (2 ** exponent), self._max_delay)
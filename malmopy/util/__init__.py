@@ -18,6 +18,7 @@
 from __future__ import absolute_import
 
 from .images import resize, rgb2gray
+from .preprocessing import FramePreprocessor
 from .util import *
 
 
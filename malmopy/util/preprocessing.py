@@ -0,0 +1,161 @@
+# Copyright (c) 2017 Microsoft Corporation.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ===================================================================================================================
+
+from __future__ import absolute_import
+
+import numpy as np
+
+from .images import OPENCV_AVAILABLE
+
+# ITU-R 601-2 luma weights (as used by Pillow and OpenCV), scaled to sum to 2 ** 16
+GRAY_WEIGHTS = (19595, 38470, 7471)
+
+
+class FramePreprocessor(object):
+    """
+    Downscale video frames to a fixed resolution, optionally converting them to grayscale.
+
+    When the frame resolution is an integer multiple of the output resolution, blocks of pixels are averaged
+    (area pooling) through reshaped views of the frame, then converted to grayscale with integer weights.
+    Intermediate results live in buffers allocated once per frame shape. Other ratios are resized with OpenCV
+    (area interpolation), or Pillow when OpenCV is not installed.
+    """
+
+    def __init__(self, width, height, grayscale=False):
+        """
+        :param width: Width of the output
+        :param height: Height of the output
+        :param grayscale: Output (height, width) grayscale images instead of (height, width, 3) RGB images
+        """
+        assert width > 0, 'width should be > 0'
+        assert height > 0, 'height should be > 0'
+
+        self._width = int(width)
+        self._height = int(height)
+        self._gray = bool(grayscale)
+        self._shape = (self._height, self._width) if self._gray else (self._height, self._width, 3)
+
+        self._frame_shape = None
+        self._factors = None
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def grayscale(self):
+        return self._gray
+
+    @property
+    def shape(self):
+        """
+        Shape of the processed frames
+        """
+        return self._shape
+
+    def _allocate(self, frame_shape):
+        height, width, channels = frame_shape
+        self._frame_shape = frame_shape
+
+        if height % self._height != 0 or width % self._width != 0:
+            self._factors = None
+            return
+
+        # Rows are summed in 16 bits, which holds up to 257 rows of 8 bits values
+        self._factors = (height // self._height, width // self._width)
+        rows_dtype = np.uint16 if self._factors[0] <= 257 else np.uint32
+        self._rows = np.empty((self._height, width, channels), dtype=rows_dtype)
+        self._sums = np.empty((self._height, self._width, 3), dtype=np.uint32)
+        if self._gray:
+            self._luma = np.empty((self._height, self._width), dtype=np.uint32)
+            self._weighted = np.empty((self._height, self._width), dtype=np.uint32)
+
+    def process(self, frame, out=None):
+        """
+        Downscale a frame
+        :param frame: uint8 array of shape (height, width, channels), channels after the 3rd (e.g. depth) are ignored
+        :param out: Optional uint8 array of shape #shape receiving the result, a new array is returned when None
+        :return: uint8 array of shape #shape
+        """
+        assert frame.ndim == 3 and frame.shape[2] >= 3, 'frame should be of shape (height, width, channels >= 3)'
+
+        if out is None:
+            out = np.empty(self._shape, dtype=np.uint8)
+        if frame.shape != self._frame_shape:
+            self._allocate(frame.shape)
+
+        if self._factors is None:
+            self._resize(frame[:, :, :3], out)
+        else:
+            self._pool(frame, out)
+        return out
+
+    __call__ = process
+
+    def _pool(self, frame, out):
+        fy, fx = self._factors
+        area = fy * fx
+        height, width, channels = frame.shape
+
+        # Sum the rows of each block, the reduced axis is not the innermost one so numpy vectorizes it well
+        rows = self._rows.reshape((self._height, width * channels))
+        np.sum(frame.reshape((self._height, fy, width * channels)), axis=1, dtype=rows.dtype, out=rows)
+
+        # Then the columns, one strided view per column of the blocks
+        sums = self._sums
+        np.copyto(sums, self._rows[:, 0::fx, :3])
+        for column in range(1, fx):
+            np.add(sums, self._rows[:, column::fx, :3], out=sums)
+
+        # Rounded mean of each block
+        np.add(sums, area // 2, out=sums)
+        np.floor_divide(sums, area, out=sums)
+
+        if not self._gray:
+            np.copyto(out, sums, casting='unsafe')
+            return
+
+        luma = self._luma
+        np.multiply(sums[:, :, 0], GRAY_WEIGHTS[0], out=luma)
+        for channel in (1, 2):
+            np.multiply(sums[:, :, channel], GRAY_WEIGHTS[channel], out=self._weighted)
+            np.add(luma, self._weighted, out=luma)
+        np.add(luma, 1 << 15, out=luma)
+        np.right_shift(luma, 16, out=luma)
+        np.copyto(out, luma, casting='unsafe')
+
+    def _resize(self, rgb, out):
+        size = (self._width, self._height)
+
+        if OPENCV_AVAILABLE:
+            import cv2
+
+            resized = cv2.resize(np.ascontiguousarray(rgb), size, interpolation=cv2.INTER_AREA)
+            if self._gray:
+                resized = cv2.cvtColor(resized, cv2.COLOR_RGB2GRAY)
+        else:
+            from PIL import Image
+
+            image = Image.fromarray(np.ascontiguousarray(rgb)).resize(size, Image.BOX)
+            if self._gray:
+                image = image.convert('L')
+            resized = np.asarray(image)
+        np.copyto(out, resized)
@@ -1,9 +1,15 @@
 import os
-from malmopy.environment.malmo import MalmoEnvironment, MalmoStateBuilder
+from math import ceil
+from time import time
+
+import numpy as np
+from malmopy.environment.malmo import CommandChannel, MalmoEnvironment, MalmoStateBuilder, MissionTemplate, \
+    sleep_through
 
 
 class Mission(object):
-    def __init__(self, mission_name, agent_names, mission_xml):
+    # randomizer(template, rng) patches the mission template before each episode (see MissionTemplate)
+    def __init__(self, mission_name, agent_names, mission_xml, randomizer=None):
         assert mission_name is not None, 'Mission must have a name'
         assert agent_names is not None and len(agent_names) > 0, 'Mission must have at least 1 agent'
         assert mission_xml is not None, 'A mission XML must be defined'
@@ -11,24 +17,202 @@ class Mission(object):
         self.mission_name = mission_name
         self.agent_names = agent_names
         self.mission_xml = mission_xml
+        self.template = MissionTemplate(mission_xml, randomizer)
 
 
+# mission_xml can also be a MissionTemplate, such as Mission.template, to skip validating it again
 class MissionEnvironment(MalmoEnvironment):
+    # Frames are rendered at this multiple of the state resolution, so that resizing them still averages pixels
+    VIDEO_OVERSAMPLING = 2
+
+    # Step of the continuous action values sent to Malmo
+    COMMAND_QUANTUM = .01
+
     def __init__(self, mission_name, mission_xml, actions, remotes, state_builder, role=0, turn_based=False,
-                 force_world_reset=False, recording_path=None):
+                 force_world_reset=False, recording_path=None, wait_strategy=None, repeat=1, max_pool_frames=False,
+                 pipeline_reset=False, start_barrier=None, client_registry=None, stall_timeout_ticks=None,
+                 recording_policy=None, wait_for_fresh_frame=False, deduplicate_commands=False):
         assert state_builder is not None, 'A mission state builder must be defined'
+        assert repeat >= 1, 'repeat should be >= 1'
 
         self._mission_name = mission_name
         self._action_space = [action_id for action_id, action in enumerate(actions)]
 
+        # Render frames at the resolution needed by the state builder, before the first MissionSpec is created
+        if not isinstance(mission_xml, MissionTemplate):
+            mission_xml = MissionTemplate(mission_xml)
+        self._negotiate_video(mission_xml, role, state_builder)
+
         super(MissionEnvironment, self).__init__(mission_xml, actions, remotes, role=role, turn_based=turn_based,
-                                                 recording_path=recording_path, force_world_reset=force_world_reset)
+                                                 recording_path=recording_path, force_world_reset=force_world_reset,
+                                                 wait_strategy=wait_strategy,
+                                                 observation_schema=getattr(state_builder, 'observation_schema', None),
+                                                 pipeline_reset=pipeline_reset, start_barrier=start_barrier,
+                                                 client_registry=client_registry,
+                                                 stall_timeout_ticks=stall_timeout_ticks,
+                                                 recording_policy=recording_policy,
+                                                 wait_for_fresh_frame=wait_for_fresh_frame)
 
         self._user_defined_builder = state_builder
 
-    # Do an action in the environment
+        # Commands of a step are sent in one flush. Deduplicating them saves sending the commands which do not change
+        # anything, but dropped commands earn no RewardForSendingCommand (see CommandChannel). Turn-based missions
+        # need every command to be sent with its turn key
+        self._commands = CommandChannel(self.COMMAND_QUANTUM,
+                                        deduplicate=deduplicate_commands and not self._turn_based)
+        self._commands.compile(actions)
+        self._awaiting_command_reward = False
+
+        # Repeat each action for this many ticks, optionally max-pooling the last 2 frames (as for Atari).
+        # The command is only sent on the first tick, so it earns its RewardForSendingCommand once per step
+        self._repeat = int(repeat)
+        self._max_pool_frames = bool(max_pool_frames)
+        self._previous_frame = None
+        self._pooled_frame = None
+        self._pooled_timestamp = None
+
+    # Shrink the role's VideoProducer to VIDEO_OVERSAMPLING times the resolution declared by the state builder,
+    # keeping its aspect ratio, so that Minecraft renders and sends as few pixels as possible. Frames are never
+    # enlarged, and the depth channel is only requested when the state builder needs 4 channels.
+    # The other producers needed by the state builder render at the same resolution, or at the state's
+    # resolution when the mission has no VideoProducer. State builders other than MissionStateBuilder (such as
+    # MalmoALEStateBuilder) declare none of these, and leave the mission unchanged.
+    def _negotiate_video(self, template, role, state_builder):
+        resolution = getattr(state_builder, 'video_resolution', None)
+        if resolution is None:
+            return
+
+        width, height = resolution
+        if template.video_size(role) is not None:
+            width, height = template.video_size(role)
+            scale = max(self.VIDEO_OVERSAMPLING * resolution[0] / float(width),
+                        self.VIDEO_OVERSAMPLING * resolution[1] / float(height))
+            if scale < 1:
+                width, height = int(ceil(width * scale)), int(ceil(height * scale))
+
+            channels = getattr(state_builder, 'video_channels', None)
+            want_depth = None
+            if channels is not None and (channels == 4) != template.video_depth(role):
+                want_depth = channels == 4
+            template.set_video_size(role, width, height, want_depth)
+
+        for producer in getattr(state_builder, 'video_producers', None) or ():
+            template.set_producer_size(role, producer, width, height)
+
+    # Same as MalmoEnvironment._send_action(), through the command channel
+    def _send_action(self, action_id):
+        assert 0 <= action_id < self.available_actions, \
+            "action %d is not valid (should be in [0, %d[)" % (action_id, self.available_actions)
+
+        self._commands.send(self._actions[action_id])
+        if self._flush_commands():
+            self._previous_action = self._actions[action_id]
+            self._action_count += 1
+
+    # Send the commands queued in the command channel. In turn-based missions they are only sent during the
+    # agent's turn, and dropped otherwise. Returns True if the commands were played.
+    def _flush_commands(self):
+        if not self._turn_based:
+            self._awaiting_command_reward = self._commands.flush(self._agent) > 0
+            return True
+
+        if not self._turn.can_play:
+            self._commands.reset()
+            self._awaiting_command_reward = False
+            return False
+
+        self._awaiting_command_reward = self._commands.flush(self._agent, str(self._turn.key)) > 0
+        self._turn.has_played = True
+        return True
+
+    @property
+    def commands(self):
+        return self._commands
+
+    # Only the tick following the commands earns their RewardForSendingCommand. The next observation is enough
+    # to end the ticks an action is held for, and the steps whose commands were all dropped by the channel
+    def is_valid(self, world_state):
+        if self._awaiting_command_reward or self._action_count == 0:
+            return super(MissionEnvironment, self).is_valid(world_state)
+        return world_state is not None and world_state.has_mission_begun and len(world_state.observations) > 0
+
+    # The active command state is lost when a new mission starts
+    def iter_reset(self):
+        self._commands.reset()
+        self._awaiting_command_reward = False
+        for delay in super(MissionEnvironment, self).iter_reset():
+            yield delay
+
+    # Do an action in the environment. The action is sent once and held for self.repeat ticks,
+    # rewards are summed over these ticks and the state is only built after the last one.
     def step(self, action):
-        super(MissionEnvironment, self).do(action)
+        sleep_through(self.iter_step(action))
+        return self.state, self._reward, self.done, {}
+
+    # Non-blocking version of step(): yields the delays to wait between polls, leaving the waiting to the caller
+    def iter_step(self, action):
+        self._send_action(action)
+        self._latency.action_sent(time())
+
+        reward = 0.
+        ticks = 0
+        has_previous_frame = False
+        while True:
+            for delay in self._iter_step_obs():
+                yield delay
+            self._awaiting_command_reward = False
+            reward += self._snapshot.reward
+            ticks += max(1, self._snapshot.ticks)
+
+            if self.done or ticks >= self._repeat:
+                break
+
+            if self._max_pool_frames:
+                has_previous_frame = self._keep_previous_frame()
+
+        if has_previous_frame:
+            self._pool_frames()
+
+        self._reward = reward
+        self._step_ticks = ticks
+        self._episode_return += reward
+
+        if self.done:
+            self._end_episode()
+
+    def _keep_previous_frame(self):
+        frame = super(MissionEnvironment, self).frame_array
+        if frame is None:
+            return False
+
+        if self._previous_frame is None or self._previous_frame.shape != frame.shape:
+            self._previous_frame = np.empty_like(frame)
+        np.copyto(self._previous_frame, frame)
+        return True
+
+    def _pool_frames(self):
+        frame = super(MissionEnvironment, self).frame_array
+        if frame is None or frame.shape != self._previous_frame.shape:
+            return
+
+        if self._pooled_frame is None or self._pooled_frame.shape != frame.shape:
+            self._pooled_frame = np.empty_like(frame)
+        np.maximum(self._previous_frame, frame, out=self._pooled_frame)
+        self._pooled_timestamp = self._snapshot.video_frame.timestamp
+
+    @property
+    def frame_array(self):
+        frame = super(MissionEnvironment, self).frame_array
+
+        # Max-pooled frame is only valid until a new video frame is received
+        if frame is not None and self._pooled_frame is not None \
+                and self._snapshot.video_frame.timestamp == self._pooled_timestamp:
+            return self._pooled_frame
+        return frame
+
+    @property
+    def repeat(self):
+        return self._repeat
 
     @property
     def state(self):
@@ -44,8 +228,136 @@ class MissionEnvironment(MalmoEnvironment):
 
 
 class MissionStateBuilder(MalmoStateBuilder):
+    # Observation fields needed by #build(), as an ObservationSchema (None when observations are not used)
+    observation_schema = None
+
+    # (width, height) of the frames needed by #build(), and their number of channels (3 for RGB, 4 for RGB + depth).
+    # The mission's VideoProducer is left unchanged when None
+    video_resolution = None
+    video_channels = None
+
+    # Names of the video producers needed by #build() besides the VideoProducer, e.g. ('ColourMapProducer',)
+    video_producers = None
+
     def __init__(self):
         super(MissionStateBuilder, self).__init__()
 
     def build(self, environment):
         super(MissionStateBuilder, self).build(environment)
+
+
+# Channel groups of a MultiProducerStateBuilder: frame type, video producer and channels of its frames
+PRODUCER_CHANNELS = {
+    'rgb': ('VIDEO', 'VideoProducer', slice(0, 3)),
+    'depth': ('VIDEO', 'VideoProducer', slice(3, 4)),
+    'colourmap': ('COLOUR_MAP', 'ColourMapProducer', slice(0, 3)),
+    'luminance': ('LUMINANCE', 'LuminanceProducer', slice(0, 1)),
+}
+
+
+class MultiProducerStateBuilder(MissionStateBuilder):
+    """
+    Stack the frames of several video producers (RGB, depth, colour map, luminance) into the channels
+    of a single uint8 state of shape (height, width, channels).
+
+    Frames are read through numpy views over their pixel buffers and copied once, into the state array.
+    Frames whose resolution is a multiple of the state's are subsampled by striding, without any copy.
+    A new state array is returned at each step, as agents may keep states by reference (e.g. in a replay memory).
+    Callers which copy the state anyway can pass a preallocated array to #build() instead.
+    """
+
+    def __init__(self, width, height, channels=('rgb', 'depth')):
+        """
+        :param width: Width of the state
+        :param height: Height of the state
+        :param channels: Sequence of channel groups, stacked in this order, among 'rgb' (3 channels),
+        'depth' (depth channel of the VideoProducer), 'colourmap' (3 channels) and 'luminance'
+        """
+        assert width > 0, 'width should be > 0'
+        assert height > 0, 'height should be > 0'
+        assert channels is not None and len(channels) > 0, 'at least 1 channel group should be provided'
+        for name in channels:
+            assert name in PRODUCER_CHANNELS, 'unknown channel group %s (should be in %s)' % (
+                name, ', '.join(sorted(PRODUCER_CHANNELS)))
+
+        self._width = width
+        self._height = height
+        self._channels = tuple(channels)
+
+        # (frame type, channels of the frame, channels of the state) for each channel group
+        self._layout = []
+        depth = 0
+        for name in self._channels:
+            frame_type, _, source = PRODUCER_CHANNELS[name]
+            count = source.stop - source.start
+            self._layout.append((frame_type, source, slice(depth, depth + count)))
+            depth += count
+        self._shape = (height, width, depth)
+
+        super(MultiProducerStateBuilder, self).__init__()
+
+    def _sample(self, frame):
+        height, width = frame.shape[:2]
+        if height % self._height == 0 and width % self._width == 0:
+            return frame[::height // self._height, ::width // self._width]
+
+        # Other ratios fall back to nearest neighbour sampling, which copies the frame
+        rows = np.arange(self._height) * height // self._height
+        columns = np.arange(self._width) * width // self._width
+        return frame[rows[:, np.newaxis], columns]
+
+    def build(self, environment, out=None):
+        """
+        :param environment: Environment to read the frames from
+        :param out: Optional uint8 array of shape (height, width, depth) receiving the state
+        :return: State array, out if provided
+        """
+        if out is None:
+            out = np.empty(self._shape, dtype=np.uint8)
+        assert out.shape == self._shape, 'out should be of shape %s' % (self._shape,)
+
+        for frame_type, source, target in self._layout:
+            frame = environment.video_frame_array(frame_type)
+            if frame is None or frame.shape[2] < source.stop:
+                out[:, :, target] = 0
+            else:
+                np.copyto(out[:, :, target], self._sample(frame)[:, :, source])
+        return out
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def channels(self):
+        return self._channels
+
+    @property
+    def depth(self):
+        """
+        Number of channels of the state
+        """
+        return self._shape[2]
+
+    @property
+    def video_resolution(self):
+        return self._width, self._height
+
+    @property
+    def video_channels(self):
+        if 'depth' in self._channels:
+            return 4
+        return 3 if 'rgb' in self._channels else None
+
+    @property
+    def video_producers(self):
+        producers = []
+        for name in self._channels:
+            producer = PRODUCER_CHANNELS[name][1]
+            if producer != 'VideoProducer' and producer not in producers:
+                producers.append(producer)
+        return tuple(producers)
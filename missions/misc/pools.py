@@ -2,6 +2,7 @@ import sys
 import six
 import numpy as np
 
+from malmopy.util import FramePreprocessor
 from mission import Mission, MissionEnvironment, MissionStateBuilder
 
 
@@ -73,7 +74,10 @@ class Pools(Mission):
 
 # Define the mission environment
 class PoolsEnvironment(MissionEnvironment):
-    def __init__(self, action_space, mission_name, mission_xml, remotes, state_builder, role=0, recording_path=None):
+    def __init__(self, action_space, mission_name, mission_xml, remotes, state_builder, role=0, recording_path=None,
+                 repeat=1, max_pool_frames=False, client_registry=None, stall_timeout_ticks=None,
+                 recording_policy=None, deduplicate_commands=False,
+                 pipeline_reset=False, wait_for_fresh_frame=False):
         if action_space == 'discrete':
             actions = ['move 1', 'move -1', 'turn 1', 'turn -1']
         elif action_space == 'continuous':
@@ -85,10 +89,16 @@ class PoolsEnvironment(MissionEnvironment):
         self._abs_max_reward = 1000  # For reward normalization needed by some RL algorithms
 
         super(PoolsEnvironment, self).__init__(mission_name, mission_xml, actions, remotes, state_builder,
-                                                   role=role, recording_path=recording_path)
-
-    # Do an action. Supports either a single discrete action or a list/tuple of continuous actions
-    def step(self, action):
+                                                   role=role, recording_path=recording_path, repeat=repeat,
+                                                   max_pool_frames=max_pool_frames, client_registry=client_registry,
+                                                   stall_timeout_ticks=stall_timeout_ticks,
+                                                   recording_policy=recording_policy,
+                                                   deduplicate_commands=deduplicate_commands,
+                                                   pipeline_reset=pipeline_reset,
+                                                   wait_for_fresh_frame=wait_for_fresh_frame)
+
+    # Send an action. Supports either a single discrete action or a list/tuple of continuous actions
+    def _send_action(self, action):
         if isinstance(action, list) or isinstance(action, tuple):
             assert 0 <= len(action) <= self.available_actions, \
                 "action list is not valid (should be of length [0, %d[)" % (
@@ -101,25 +111,21 @@ class PoolsEnvironment(MissionEnvironment):
 
         if isinstance(action, list) or isinstance(action, tuple):
             # For continuous action space, do the environment action(s) by the amount sent by the agent for each
-            action = [self._actions[i] + ' ' + str(action[i]) for i in range(len(action))]
+            for i in range(len(action)):
+                self._commands.set(self._actions[i], action[i])
         else:
             # For discrete action space, do the environment action corresponding to the action id sent by the agent
             action = self._actions[action_id]
             assert isinstance(action, six.string_types)
 
-        if isinstance(action, list):
-            for i in range(len(action)):
-                self._agent.sendCommand(action[i])
-        else:
             if self._previous_action == 'use 1':
-                self._agent.sendCommand('use 0')
-            self._agent.sendCommand(action)
+                self._commands.send('use 0')
+            self._commands.send(action)
+
+        self._flush_commands()
         self._previous_action = action
         self._action_count += 1
 
-        self._await_next_obs()
-        return self.state, sum([reward.getValue() for reward in self._world.rewards]), self.done, {}
-
     @property
     def abs_max_reward(self):
         return self._abs_max_reward
@@ -137,19 +143,16 @@ class PoolsStateBuilder(MissionStateBuilder):
         self._width = width
         self._height = height
         self._gray = bool(grayscale)
+        self._preprocessor = FramePreprocessor(width, height, grayscale)
 
         super(PoolsStateBuilder, self).__init__()
 
     def build(self, environment):
 
-        img = environment.frame
+        frame = environment.frame_array
 
-        if img is not None:
-            img = img.resize((self._width, self._height))
-
-            if self._gray:
-                img = img.convert('L')
-            return np.array(img)
+        if frame is not None:
+            return self._preprocessor.process(frame)
         else:
             return np.zeros((self._width, self._height, 1 if self._gray else 3)).squeeze()
 
@@ -164,3 +167,12 @@ class PoolsStateBuilder(MissionStateBuilder):
     @property
     def grayscale(self):
         return self._gray
+
+    @property
+    def video_resolution(self):
+        return self._width, self._height
+
+    # Frames are converted to grayscale after resizing, Minecraft still renders RGB
+    @property
+    def video_channels(self):
+        return 3
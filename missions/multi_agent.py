@@ -1,6 +1,7 @@
 import six
 
 import random
+from malmopy.environment.malmo import ObservationSchema
 from mission import Mission, MissionEnvironment, MissionStateBuilder
 
 
@@ -87,7 +88,17 @@ class MultiAgent(Mission):
 
         mission_xml += '''</Mission>'''
 
-        super(MultiAgent, self).__init__(mission_name=mission_name, agent_names=agent_names, mission_xml=mission_xml)
+        super(MultiAgent, self).__init__(mission_name=mission_name, agent_names=agent_names, mission_xml=mission_xml,
+                                         randomizer=self.randomize)
+
+    # Draw new agent placements, mobs and items for each episode, without building the mission XML again
+    def randomize(self, template, rng):
+        for role in range(len(self.agent_names) - 1):
+            template.set_placement(role, rng.randint(-17, 17), 204, rng.randint(-17, 17))
+        template.draw_entities([(rng.randint(-17, 17), 214, rng.randint(-17, 17), 'Zombie')
+                                for _ in range(self.NUM_MOBS)])
+        template.draw_items([(rng.randint(-17, 17), 224, rng.randint(-17, 17), 'apple')
+                             for _ in range(self.NUM_ITEMS)])
 
     def drawMobs(self):
         xml = ""
@@ -106,20 +117,31 @@ class MultiAgent(Mission):
         return xml
 
 
-# Define the mission environment
+# Define the mission environment.
+# The arena is redrawn by the DrawingDecorator at each mission: its air cuboid clears the blocks and entities left
+# by the previous episode, and the mobs, items and agents are placed again. The flat world is hence only regenerated
+# every force_world_reset missions.
 class MultiAgentEnvironment(MissionEnvironment):
     def __init__(self, mission_name, mission_xml, remotes, state_builder, role=0, recording_path=None,
-                 force_world_reset=True):
+                 force_world_reset=20, repeat=1, start_barrier=None, client_registry=None,
+                 stall_timeout_ticks=None, recording_policy=None, deduplicate_commands=False,
+                 pipeline_reset=False, wait_for_fresh_frame=False):
         actions = ['move 1', 'move -1', 'turn 1', 'turn -1', 'attack 1']
 
         self._abs_max_reward = 10  # For reward normalization needed by some RL algorithms
 
         super(MultiAgentEnvironment, self).__init__(mission_name, mission_xml, actions, remotes, state_builder,
                                                     role=role, recording_path=recording_path,
-                                                    force_world_reset=force_world_reset)
-
-    # Do an action
-    def step(self, action):
+                                                    force_world_reset=force_world_reset, repeat=repeat,
+                                                    start_barrier=start_barrier, client_registry=client_registry,
+                                                    stall_timeout_ticks=stall_timeout_ticks,
+                                                    recording_policy=recording_policy,
+                                                    deduplicate_commands=deduplicate_commands,
+                                                    pipeline_reset=pipeline_reset,
+                                                    wait_for_fresh_frame=wait_for_fresh_frame)
+
+    # Send an action
+    def _send_action(self, action):
         action_id = action
         assert 0 <= action_id <= self.available_actions, \
             "action %d is not valid (should be in [0, %d[)" % (action_id,
@@ -131,14 +153,12 @@ class MultiAgentEnvironment(MissionEnvironment):
 
         if self._action_count > 0:
             if self._previous_action == 'attack 1':
-                self._agent.sendCommand('attack 0')
-        self._agent.sendCommand(action)
+                self._commands.send('attack 0')
+        self._commands.send(action)
+        self._flush_commands()
         self._previous_action = action
         self._action_count += 1
 
-        self._await_next_obs()
-        return self.state, sum([reward.getValue() for reward in self._world.rewards]), self.done, {}
-
     @property
     def abs_max_reward(self):
         return self._abs_max_reward
@@ -146,9 +166,11 @@ class MultiAgentEnvironment(MissionEnvironment):
 
 # Return low-level observations
 class MultiAgentStateBuilder(MissionStateBuilder):
+    observation_schema = ObservationSchema([('XPos', float), ('YPos', float), ('ZPos', float), ('Yaw', float),
+                                            ('Life', float)], name='MultiAgentObservation')
+
     def __init__(self):
         super(MultiAgentStateBuilder, self).__init__()
 
     def build(self, environment):
-        world_obs = environment.world_observations
-        return world_obs
+        return environment.observation_record
@@ -1,57 +1,75 @@
-import os
 from argparse import ArgumentParser
-from multiprocessing import Process, active_children
-from time import sleep
+from multiprocessing import Process
 from common import parse_clients_args
 
+from malmopy.environment.malmo import start_client_manager
+
 from missions.classroom import Classroom
 
 
-def agent_factory(name, role, clients, agent_type, steps, mission, action_space, mode):
+def agent_factory(name, role, clients, agent_type, steps, mission, action_space, repeat, mode, client_manager,
+                  stall_timeout_ticks, record_every, record_budget_mb, calibrate, pipeline_reset, wait_for_fresh_frame):
     from missions.classroom import ClassroomEnvironment, ClassroomStateBuilder
 
     from malmo_rl.agents.abstract_agent import AbstractAgent
+    from malmopy.environment.malmo import RecordingPolicy, TickCalibrator, connect_client_manager
 
     clients = parse_clients_args(clients)
+    client_registry = connect_client_manager(*client_manager)
 
-    recording_dir = 'records/{}'.format(mission.mission_name)
-    if not os.path.exists(recording_dir):
-        os.makedirs(recording_dir)
-    recording_path = os.path.join(recording_dir, '{}.tgz'.format(name))
+    # Record a sample of the training episodes and all the evaluation episodes, within a disk budget
+    recording_policy = RecordingPolicy('records/{}'.format(mission.mission_name), prefix=name, every=record_every,
+                                       evaluation=True, max_bytes=record_budget_mb * 1024 * 1024)
 
     state_builder = ClassroomStateBuilder(width=32, height=32, grayscale=True)
-    env = ClassroomEnvironment(action_space, mission.mission_name, mission.mission_xml, clients, state_builder,
-                               role=role, recording_path=recording_path)
-
-    if 'Observer' in name:
-        agent_type = 'observer'
+    env = ClassroomEnvironment(action_space, mission.mission_name, mission.template, clients, state_builder,
+                               role=role, repeat=repeat, client_registry=client_registry,
+                               stall_timeout_ticks=stall_timeout_ticks, recording_policy=recording_policy,
+                               pipeline_reset=pipeline_reset, wait_for_fresh_frame=wait_for_fresh_frame)
 
-    agent = AbstractAgent(name, env, agent_type, grayscale=state_builder.grayscale, width=state_builder.width,
-                          height=state_builder.height)
-    print(name + ' initialized.')
-
-    weights_filename = 'weights/{}/{}_{}'.format(mission.mission_name, agent_type, name)
-    if mode == 'training':
-        agent.fit(env, steps)
-        agent.save(weights_filename)
-    else:
-        agent.load(weights_filename)
-        agent.test(env, nb_episodes=10)
+    # Give the leased client back to the client manager, whether the agent finished or failed
+    try:
+        if 'Observer' in name:
+            agent_type = 'observer'
+
+        agent = AbstractAgent(name, env, agent_type, grayscale=state_builder.grayscale, width=state_builder.width,
+                              height=state_builder.height)
+        print(name + ' initialized.')
+
+        # Run the mission as fast as the agent can keep up with
+        if calibrate:
+            calibrator = TickCalibrator(env, agent.act, action_repetition=getattr(agent.agent, 'action_repetition', 1))
+            ms_per_tick = calibrator.calibrate()
+            for result in calibrator.results:
+                print(result)
+            print('{} calibrated MsPerTick: {}'.format(name, ms_per_tick))
+
+        weights_filename = 'weights/{}/{}_{}'.format(mission.mission_name, agent_type, name)
+        if mode == 'training':
+            agent.fit(env, steps)
+            agent.save(weights_filename)
+        else:
+            agent.load(weights_filename)
+            agent.test(env, nb_episodes=10)
+    finally:
+        env.close()
 
 
 def run_experiment(agents_def):
     assert len(agents_def) >= 1, 'Not enough agents (required: >= 1, got: %d)' \
                                  % len(agents_def)
 
+    processes = []
     for agent in agents_def:
         p = Process(target=agent_factory, kwargs=agent)
         p.daemon = True
         p.start()
+        processes.append(p)
 
     try:
-        # wait until all agents are finished
-        while len(active_children()) > 0:
-            sleep(0.1)
+        # wait until all agents are finished (the client manager is a child process too, it keeps running)
+        for p in processes:
+            p.join()
     except KeyboardInterrupt:
         print('Caught control-c - shutting down.')
 
@@ -62,12 +80,33 @@ if __name__ == '__main__':
                             help='Malmo running speed')
     arg_parser.add_argument('--clients', default='clients.txt',
                             help='.txt file with client(s) IP addresses')
+    arg_parser.add_argument('--client-manager', default=None,
+                            help='ip:port of a client manager shared with other experiments (default starts one)')
+    arg_parser.add_argument('--client-manager-authkey', default='malmorl',
+                            help='Key required to connect to the client manager')
     arg_parser.add_argument('--steps', type=int, default=1000000,
                             help='Number of steps to train for')
     arg_parser.add_argument('--action-space', default='discrete',
                             help='Action space to use (discrete, continuous)')
     arg_parser.add_argument('--agents', default=['random'], nargs='+',
                             help='Agent(s) to use (default is 1 Random agent)')
+    arg_parser.add_argument('--repeat', type=int, default=1, choices=[1, 2, 4],
+                            help='Number of ticks each action is repeated for by the environment, the agents '
+                                 'repeat it the remaining times up to 4. The environment sends the command once, '
+                                 'so RewardForSendingCommand is only earned once per repetition')
+    arg_parser.add_argument('--stall-timeout-ticks', type=int, default=200,
+                            help='Restart the mission on another client after this many ticks without observation'
+                                 ' (0 disables the watchdog)')
+    arg_parser.add_argument('--record-every', type=int, default=100,
+                            help='Record one training episode out of this many (evaluation episodes are all recorded)')
+    arg_parser.add_argument('--record-budget-mb', type=int, default=1024,
+                            help='Disk budget of the recordings of each agent, the oldest are deleted first')
+    arg_parser.add_argument('--calibrate', action='store_true',
+                            help='Probe several MsPerTick values and use the fastest one the agent keeps up with')
+    arg_parser.add_argument('--pipeline-reset', action='store_true',
+                            help='Request the next mission as soon as the current one ends, before reset() is called')
+    arg_parser.add_argument('--wait-for-fresh-frame', action='store_true',
+                            help='Wait at each step for a frame rendered after the action was sent')
     arg_parser.add_argument('--mode', default='training',
                             help='Training or testing mode')
     args = arg_parser.parse_args()
@@ -77,7 +116,9 @@ if __name__ == '__main__':
     steps = args.steps
     action_space = args.action_space
     agents = args.agents
+    repeat = args.repeat
     mode = args.mode
+    stall_timeout_ticks = args.stall_timeout_ticks if args.stall_timeout_ticks > 0 else None
 
     mission = Classroom(ms_per_tick)
     mission_agent_names = mission.agent_names
@@ -88,9 +129,27 @@ if __name__ == '__main__':
     print('Clients: {}'.format(clients))
     assert len(clients) >= len(mission_agent_names), '1 Malmo client for each agent must be specified in clients.txt'
 
+    # Lease clients from a single manager so that agents (and experiments sharing it) do not collide
+    authkey = args.client_manager_authkey.encode('utf-8')
+    manager = None
+    if args.client_manager is not None:
+        ip, port = args.client_manager.split(':')
+        client_manager = ((ip, int(port)), authkey)
+    else:
+        manager, _ = start_client_manager(clients, authkey=authkey)
+        client_manager = (manager.address, authkey)
+
     # Setup agents
     agents_def = [{'name': agent_name, 'role': idx, 'clients': clients, 'agent_type': agents[idx], 'steps': steps,
-                   'mission': mission, 'action_space': action_space, 'mode': mode}
+                   'mission': mission, 'action_space': action_space, 'repeat': repeat, 'mode': mode,
+                   'client_manager': client_manager, 'stall_timeout_ticks': stall_timeout_ticks,
+                   'record_every': args.record_every, 'record_budget_mb': args.record_budget_mb,
+                   'calibrate': args.calibrate, 'pipeline_reset': args.pipeline_reset,
+                   'wait_for_fresh_frame': args.wait_for_fresh_frame}
                   for idx, agent_name in enumerate(mission_agent_names)]
 
-    run_experiment(agents_def)
+    try:
+        run_experiment(agents_def)
+    finally:
+        if manager is not None:
+            manager.shutdown()
@@ -1,27 +1,33 @@
-import os
 from argparse import ArgumentParser
 from multiprocessing import Process, active_children
 from time import sleep
 from common import parse_clients_args
 
+from malmopy.environment.malmo import MissionStartBarrier
 from missions.multi_agent import MultiAgent
 
 
-def agent_factory(name, role, clients, agent_type, steps, mission, mode):
+def agent_factory(name, role, clients, agent_type, steps, mission, repeat, mode, start_barrier,
+                  stall_timeout_ticks, record_every, record_budget_mb, world_reset_interval, pipeline_reset,
+                  wait_for_fresh_frame):
     from missions.multi_agent import MultiAgentEnvironment, MultiAgentStateBuilder
 
     from malmo_rl.agents.abstract_agent import AbstractAgent
+    from malmopy.environment.malmo import RecordingPolicy
 
+    # Role 0 starts each mission on all the clients, one per agent: they are not leased from a client manager
     clients = parse_clients_args(clients)
 
-    recording_dir = 'records/{}'.format(mission.mission_name)
-    if not os.path.exists(recording_dir):
-        os.makedirs(recording_dir)
-    recording_path = os.path.join(recording_dir, '{}.tgz'.format(name))
+    # Record a sample of the training episodes and all the evaluation episodes, within a disk budget
+    recording_policy = RecordingPolicy('records/{}'.format(mission.mission_name), prefix=name, every=record_every,
+                                       evaluation=True, max_bytes=record_budget_mb * 1024 * 1024)
 
     state_builder = MultiAgentStateBuilder()
-    env = MultiAgentEnvironment(mission.mission_name, mission.mission_xml, clients, state_builder,
-                                role=role, recording_path=recording_path)
+    env = MultiAgentEnvironment(mission.mission_name, mission.template, clients, state_builder,
+                                role=role, repeat=repeat, force_world_reset=world_reset_interval,
+                                start_barrier=start_barrier,
+                                stall_timeout_ticks=stall_timeout_ticks, recording_policy=recording_policy,
+                                pipeline_reset=pipeline_reset, wait_for_fresh_frame=wait_for_fresh_frame)
 
     if 'Observer' in name:
         agent_type = 'observer'
@@ -65,6 +71,24 @@ if __name__ == '__main__':
                             help='Number of steps to train for')
     arg_parser.add_argument('--agents', default='random random observer', nargs='+',
                             help='Agent(s) to use (default is 2 Random agents and an Observer)')
+    arg_parser.add_argument('--repeat', type=int, default=1, choices=[1, 2, 4],
+                            help='Number of ticks each action is repeated for by the environment, the agents '
+                                 'repeat it the remaining times up to 4. The environment sends the command once, '
+                                 'so RewardForSendingCommand is only earned once per repetition')
+    arg_parser.add_argument('--stall-timeout-ticks', type=int, default=200,
+                            help='Restart the mission on another client after this many ticks without observation'
+                                 ' (0 disables the watchdog)')
+    arg_parser.add_argument('--record-every', type=int, default=100,
+                            help='Record one training episode out of this many (evaluation episodes are all recorded)')
+    arg_parser.add_argument('--record-budget-mb', type=int, default=1024,
+                            help='Disk budget of the recordings of each agent, the oldest are deleted first')
+    arg_parser.add_argument('--world-reset-interval', type=int, default=20,
+                            help='Regenerate the world every this many missions (1 for every mission), '
+                                 'it is reused otherwise')
+    arg_parser.add_argument('--pipeline-reset', action='store_true',
+                            help='Request the next mission as soon as the current one ends, before reset() is called')
+    arg_parser.add_argument('--wait-for-fresh-frame', action='store_true',
+                            help='Wait at each step for a frame rendered after the action was sent')
     arg_parser.add_argument('--mode', default='training',
                             help='Training or testing mode')
     args = arg_parser.parse_args()
@@ -73,7 +97,9 @@ if __name__ == '__main__':
     clients = args.clients
     steps = args.steps
     agents = args.agents
+    repeat = args.repeat
     mode = args.mode
+    stall_timeout_ticks = args.stall_timeout_ticks if args.stall_timeout_ticks > 0 else None
 
     mission = MultiAgent(ms_per_tick)
     mission_agent_names = mission.agent_names
@@ -84,9 +110,16 @@ if __name__ == '__main__':
     print('Clients: {}'.format(clients))
     assert len(clients) >= len(mission_agent_names), '1 Malmo client for each agent must be specified in clients.txt'
 
+    # Let the other roles join as soon as role 0 has started each mission
+    start_barrier = MissionStartBarrier()
+
     # Setup agents
     agents_def = [{'name': agent_name, 'role': idx, 'clients': clients, 'agent_type': agents[idx], 'steps': steps,
-                   'mission': mission, 'mode': mode}
+                   'mission': mission, 'repeat': repeat, 'mode': mode, 'start_barrier': start_barrier,
+                   'stall_timeout_ticks': stall_timeout_ticks,
+                   'record_every': args.record_every, 'record_budget_mb': args.record_budget_mb,
+                   'world_reset_interval': args.world_reset_interval, 'pipeline_reset': args.pipeline_reset,
+                   'wait_for_fresh_frame': args.wait_for_fresh_frame}
                   for idx, agent_name in enumerate(mission_agent_names)]
 
     run_experiment(agents_def)